@@ -0,0 +1,52 @@
+"""Bot evaluating its leaves with othello_incremental.IncrementalFeatures, updated move by move."""
+
+from __future__ import (
+    annotations,
+)  # postpones the evaluation of the type hints, hence they do not need to be imported
+import othello
+import othello_incremental
+import othello_probcut
+import othello_search
+
+MAX_DEPTH = 5
+
+
+class FeatureStrategist:
+    """Searches with the incremental features of othello_incremental (squares, frontier, edges)"""
+
+    def __init__(self, selective: bool = False):
+        """With selective, the search uses the calibrated ProbCut parameters to go deeper"""
+        # Kept up to date by the search along its path: a leaf is evaluated in O(flips)
+        self.features = othello_incremental.IncrementalFeatures()
+        probcut = othello_probcut.load("FeatureStrategist") if selective else None
+        depth = MAX_DEPTH + 1 + (othello_probcut.EXTRA_DEPTH if probcut else 0)
+        self.search = othello_search.SearchCore(
+            self.features.evaluate, depth, incremental=self.features, probcut=probcut
+        )
+
+    def next_move(
+        self, board: othello.OthelloGame, limits: othello_search.SearchLimits = None
+    ) -> tuple[int, int]:
+        """Returns the next move to play.
+
+        Args:
+            board (othello.OthelloGame): the game, not modified
+            limits (othello_search.SearchLimits): depth, time or node limits of the search
+
+        Returns:
+            tuple[int, int]: the next move (for instance: (2, 3) for (row, column), starting from 0)
+        """
+        possible_moves = set(board.get_possible_move())
+        if len(possible_moves) > 1:
+            _, move = self.search.search(board.copy_game(), board.get_turn(), limits)
+            return move
+        return board.get_possible_move()[0]
+
+    def alpha_beta(
+        self, depth: int, game: othello.OthelloGame, alpha: float, beta: float, player: str
+    ) -> tuple[float, tuple[int, int]]:
+        """Alpha-beta of the given depth, run by the shared search core (see othello_search)"""
+        return self.search.alpha_beta(game, depth, alpha, beta, player)
+
+    def __str__(self):
+        return "FeatureStrategist"
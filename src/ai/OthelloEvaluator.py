@@ -1,5 +1,6 @@
 import numpy as np
 import othello
+import othello_tuner
 
 
 class OthelloEvaluator:
@@ -9,12 +10,18 @@ class OthelloEvaluator:
         self.MID_GAME = 40
         self.LATE_GAME = 64  # Full board
 
-        # Pre-computed pattern weights for different game phases
-        # These would normally be learned from game data
+        # Pattern weights for different game phases (Mobility, Pattern, Material),
+        # learned from game data by othello_tuner when a weights file exists
+        default_weights = {
+            "early": [0.2, 0.4, 0.4],
+            "mid": [0.3, 0.4, 0.3],
+            "late": [0.1, 0.5, 0.4],
+        }
         self.pattern_weights = {
-            "early": np.array([0.2, 0.4, 0.4]),  # Mobility, Stability, Corner patterns
-            "mid": np.array([0.3, 0.4, 0.3]),
-            "late": np.array([0.1, 0.5, 0.4]),
+            phase: np.array(weights)
+            for phase, weights in othello_tuner.load_weights(
+                "OthelloEvaluator", default_weights
+            ).items()
         }
 
         # Initialize pattern tables and indices
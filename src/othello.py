@@ -2,7 +2,9 @@
 This is the file with the Othello game logic. It contains the OthelloGame class that represents the game state
 """
 
+import collections
 import copy
+import othello_bitboard
 
 # Game Constants
 NONE = '.'
@@ -10,6 +12,11 @@ BLACK = 'B'
 WHITE = 'W'
 
 
+# Record of a move: the placed cell, the color that played it, the (row, col) of the
+# flipped cells and the scores before the move, enough to undo it with OthelloGame.undo
+MoveDelta = collections.namedtuple("MoveDelta", ["row", "col", "color", "flipped", "scores"])
+
+
 class InvalidMoveException(Exception):
     """ Raised whenever an exception arises from an invalid move """
     pass
@@ -61,12 +68,13 @@ class OthelloGame:
 
         return board
 
-    def move(self, row: int, col: int, fake_move: bool = False):
+    def move(self, row: int, col: int, fake_move: bool = False, return_delta: bool = False):
         """ Attempts to make a move at given row/col position.
             Current player/turn is the one that makes the move.
             If the player cannot make a move it raises an exception.
             If the player can make a move, the player finally plays
-            the valid move and switches turn. """
+            the valid move and switches turn.
+            With return_delta, returns the MoveDelta of the move. """
 
         # Check to see if the move is in a valid empty space
         # within the board's boundary
@@ -80,11 +88,14 @@ class OthelloGame:
         self._require_valid_empty_space_to_move(row, col)
         possible_directions = self._adjacent_opposite_color_directions(row, col, self.turn)
 
+        color = self.turn
+        scores = self.scores
+        flipped = []
         next_turn = self.turn
         for direction in possible_directions:
             if self._is_valid_directional_move(row, col, direction[0], direction[1], self.turn):
                 next_turn = self._opposite_turn(self.turn)
-            self._convert_adjacent_cells_in_direction(row, col, direction[0], direction[1], self.turn)
+            flipped += self._convert_adjacent_cells_in_direction(row, col, direction[0], direction[1], self.turn)
 
         if next_turn != self.turn:
             self.current_board[row][col] = self.turn
@@ -99,6 +110,50 @@ class OthelloGame:
             self.current_board = temp_board
             return fake_board
 
+        if return_delta:
+            return MoveDelta(row, col, color, tuple(flipped), scores)
+
+    def play_trusted(self, row: int, col: int) -> None:
+        """ Plays a move known to be legal, from a game record for instance,
+            without validating it nor looking for the next player's moves:
+            the turn always goes to the opponent, passes are played with
+            switch_turn(). """
+        turn = self.turn
+        opponent = self._opposite_turn(turn)
+        board = self.current_board
+        flipped = 0
+        for rowdelta, coldelta in othello_bitboard.DIRECTIONS:
+            current_row = row + rowdelta
+            current_col = col + coldelta
+            run = []
+            while (0 <= current_row < self.rows and 0 <= current_col < self.cols
+                   and board[current_row][current_col] == opponent):
+                run.append((current_row, current_col))
+                current_row += rowdelta
+                current_col += coldelta
+            if (run and 0 <= current_row < self.rows and 0 <= current_col < self.cols
+                    and board[current_row][current_col] == turn):
+                for run_row, run_col in run:
+                    board[run_row][run_col] = turn
+                flipped += len(run)
+        board[row][col] = turn
+
+        black, white = self.scores
+        if turn == BLACK:
+            self.scores = (black + flipped + 1, white - flipped)
+        else:
+            self.scores = (black - flipped, white + flipped + 1)
+        self.turn = opponent
+
+    def undo(self, delta: MoveDelta) -> None:
+        """ Takes back the move described by the delta returned by move().
+            Moves must be undone in the reverse order they were played. """
+        self.current_board[delta.row][delta.col] = NONE
+        for row, col in delta.flipped:
+            self._flip_cell(row, col)
+        self.turn = delta.color
+        self.scores = delta.scores
+
     def _is_valid_directional_move(self, row: int, col: int, rowdelta: int, coldelta: int, turn: str) -> bool:
         """ Given a move at specified row/col, checks in the given direction to see if
             a valid move can be made. Returns True if it can; False otherwise.
@@ -138,17 +193,21 @@ class OthelloGame:
         return dir_list
 
     def _convert_adjacent_cells_in_direction(self, row: int, col: int,
-                                             rowdelta: int, coldelta: int, turn: str) -> None:
+                                             rowdelta: int, coldelta: int, turn: str) -> [tuple]:
         """ If it can, converts all the adjacent/contiguous cells on a turn in
-            a given direction until it finally reaches the specified cell's original color """
+            a given direction until it finally reaches the specified cell's original color.
+            Returns the list of the converted cells. """
+        flipped = []
         if self._is_valid_directional_move(row, col, rowdelta, coldelta, turn):
             current_row = row + rowdelta
             current_col = col + coldelta
 
             while self._cell_color(current_row, current_col) == self._opposite_turn(turn):
                 self._flip_cell(current_row, current_col)
+                flipped.append((current_row, current_col))
                 current_row += rowdelta
                 current_col += coldelta
+        return flipped
 
     def get_possible_move(self):
         """ Looks at all the empty cells in the board and return possible moves """
@@ -171,13 +230,9 @@ class OthelloGame:
         """ Looks at all the empty cells in the board and checks to
             see if the specified player can move in any of the cells.
             Returns True if it can move; False otherwise. """
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if self.current_board[row][col] == NONE:
-                    for direction in self._adjacent_opposite_color_directions(row, col, turn):
-                        if self._is_valid_directional_move(row, col, direction[0], direction[1], turn):
-                            return True
-        return False
+        own, other = self.get_bitboards(turn)
+        geometry = othello_bitboard.get_geometry(self.rows, self.cols)
+        return geometry.legal_moves(own, other) != 0
 
     def return_winner(self) -> str:
         """ Returns the winner. ONLY to be called once the game is over.
@@ -222,16 +277,39 @@ class OthelloGame:
         else:
             return self.scores
 
+    def get_bitboards(self, color: str = BLACK) -> (int, int):
+        """ Returns the bitboards of the discs of color and of its opponent """
+        return othello_bitboard.from_board(self.current_board, color)
+
+    def mobility(self, color: str) -> int:
+        """ Returns the number of legal moves of the specified player,
+            whoever's turn it is """
+        own, other = self.get_bitboards(color)
+        geometry = othello_bitboard.get_geometry(self.rows, self.cols)
+        return bin(geometry.legal_moves(own, other)).count("1")
+
+    def potential_mobility(self, color: str) -> int:
+        """ Returns the number of empty cells next to a disc of the opponent
+            of the specified player """
+        own, other = self.get_bitboards(color)
+        geometry = othello_bitboard.get_geometry(self.rows, self.cols)
+        empty = geometry.full & ~(own | other)
+        return bin(geometry.neighbours(other) & empty).count("1")
+
+    def frontier_count(self, color: str) -> int:
+        """ Returns the number of discs of the specified player next to an empty cell """
+        own, other = self.get_bitboards(color)
+        geometry = othello_bitboard.get_geometry(self.rows, self.cols)
+        empty = geometry.full & ~(own | other)
+        return bin(geometry.neighbours(empty) & own).count("1")
+
     def compute_scores(self) -> (int, int):
         """ Returns the total cell count of the specified colored player """
         black = 0
         white = 0
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if self.current_board[row][col] == BLACK:
-                    black += 1
-                elif self.current_board[row][col] == WHITE:
-                    white += 1
+        for row in self.current_board:
+            black += row.count(BLACK)
+            white += row.count(WHITE)
         return black, white
     
 
@@ -0,0 +1,83 @@
+"""
+Background analysis of positions: the score of every legal move, deeper and deeper.
+
+An Analyser owns a bot built on othello_search.SearchCore, which must not be used to play at the
+same time. analyse(game) runs the multi-PV search of the core (SearchCore.analyse) on the
+position in a background thread; after each completed depth, progress(key, depth, scores) is called from that thread with the
+exact score of every legal move, from the point of view of the player to move. Analysing
+another position stops the current analysis. The results are cached per position, so going
+back to an analysed position shows its scores at once, and its transposition table entries make
+the first depths cheap.
+"""
+
+from __future__ import annotations
+
+import threading
+import othello
+import othello_ponder
+import othello_registry
+import othello_search
+
+# Bot whose search and evaluation are used by the analysis
+ANALYSIS_BOT = "Marti_Da_Silva_Ruhoff"
+
+
+class Analyser:
+    """Analyses positions in a background thread, one at a time"""
+
+    def __init__(self, bot_name: str = ANALYSIS_BOT, progress=None):
+        self.bot = othello_registry.create(bot_name)
+        self.core = self.bot.search
+        # Checked every few nodes by the search, which is then aborted
+        self.core.should_stop = lambda: self._stopped.is_set()
+        self.progress = progress
+        # position key -> (depth, {move: score})
+        self.cache = {}
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def cached(self, game: othello.OthelloGame) -> tuple[int, dict]:
+        """(depth, scores) of the position found by a previous analysis, None if not analysed"""
+        return self.cache.get(othello_ponder.position_key(game))
+
+    def analyse(self, game: othello.OthelloGame) -> None:
+        """Stops the running analysis and starts analysing a copy of the game"""
+        self.stop()
+        if not game.get_possible_move() or game.is_game_over():
+            return
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(game.copy_game(), self._stopped), daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the running analysis, if any"""
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, game: othello.OthelloGame, stopped: threading.Event) -> None:
+        try:
+            self._deepen(game, stopped)
+        except othello_search.SearchAborted:
+            pass
+
+    def _deepen(self, game: othello.OthelloGame, stopped: threading.Event) -> None:
+        key = othello_ponder.position_key(game)
+        reached, scores = self.cache.get(key, (0, {}))
+        if scores and self.progress is not None:
+            self.progress(key, reached, scores)
+
+        def on_iteration(depth: int, results: list[othello_search.MoveScore]) -> None:
+            if depth <= reached or stopped.is_set():
+                return
+            scores = {result.move: result.score for result in results}
+            self.cache[key] = (depth, scores)
+            if self.progress is not None:
+                self.progress(key, depth, scores)
+
+        empties = game.get_rows() * game.get_columns() - sum(game.get_scores())
+        limits = othello_search.SearchLimits(depth=empties)
+        self.core.analyse(game, None, limits, progress=on_iteration)
@@ -0,0 +1,150 @@
+"""
+Bitboard representation of the Othello board.
+
+A bitboard is a Python int holding one bit per cell, the cell (row, col) being the bit
+row * cols + col. The Geometry class holds the masks needed to work on bitboards of a given
+board size, it is built once per size by get_geometry().
+"""
+
+from __future__ import annotations
+
+import functools
+import othello
+
+DIRECTIONS = [
+    (-1, -1),
+    (-1, 0),
+    (-1, 1),
+    (0, -1),
+    (0, 1),
+    (1, -1),
+    (1, 0),
+    (1, 1),
+]
+
+# One direction per line axis: horizontal, vertical, diagonal and anti-diagonal
+AXES = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+
+class Geometry:
+    """Masks and helpers for the bitboards of a rows x cols board"""
+
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.full = (1 << self.size) - 1
+
+        left_column = sum(1 << (row * cols) for row in range(rows))
+        self.not_left = self.full & ~left_column
+        self.not_right = self.full & ~(left_column << (cols - 1))
+
+        # Cells of the four edges, each ordered from one corner to the other
+        self.edges = [
+            [col for col in range(cols)],
+            [(rows - 1) * cols + col for col in range(cols)],
+            [row * cols for row in range(rows)],
+            [row * cols + cols - 1 for row in range(rows)],
+        ]
+        self.border = sum(1 << cell for cell in {cell for edge in self.edges for cell in edge})
+        self.interior = self.full & ~self.border
+
+        # Masks of every line of the board, grouped by axis
+        self.lines = {axis: self._lines(axis) for axis in AXES}
+
+    def _lines(self, axis: tuple[int, int]) -> list[int]:
+        """Return the masks of all the lines of the board along an axis"""
+        d_row, d_col = axis
+        lines = []
+        for row in range(self.rows):
+            for col in range(self.cols):
+                # Only start a line from its first cell
+                if self.is_inside(row - d_row, col - d_col):
+                    continue
+                line = 0
+                current_row, current_col = row, col
+                while self.is_inside(current_row, current_col):
+                    line |= self.bit(current_row, current_col)
+                    current_row += d_row
+                    current_col += d_col
+                lines.append(line)
+        return lines
+
+    def is_inside(self, row: int, col: int) -> bool:
+        """Returns True if the cell is on the board"""
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    def bit(self, row: int, col: int) -> int:
+        """Returns the bitboard with only the given cell set"""
+        return 1 << (row * self.cols + col)
+
+    def shift(self, bits: int, direction: tuple[int, int]) -> int:
+        """Moves every disc of the bitboard one cell in the given direction"""
+        d_row, d_col = direction
+        offset = d_row * self.cols + d_col
+        bits = bits << offset if offset > 0 else bits >> -offset
+        if d_col == 1:
+            bits &= self.not_left
+        elif d_col == -1:
+            bits &= self.not_right
+        return bits & self.full
+
+    def full_lines(self, occupied: int, axis: tuple[int, int]) -> int:
+        """Returns the mask of the cells whose line along the axis has no empty cell"""
+        full = 0
+        for line in self.lines[axis]:
+            if occupied & line == line:
+                full |= line
+        return full
+
+    def neighbours(self, bits: int) -> int:
+        """Returns the mask of the cells next to at least one cell of the bitboard"""
+        result = 0
+        for direction in DIRECTIONS:
+            result |= self.shift(bits, direction)
+        return result
+
+    def legal_moves(self, own: int, other: int) -> int:
+        """Returns the mask of the legal moves of the player owning the discs own"""
+        empty = self.full & ~(own | other)
+        moves = 0
+        for direction in DIRECTIONS:
+            run = self.shift(own, direction) & other
+            while True:
+                longer = run | (self.shift(run, direction) & other)
+                if longer == run:
+                    break
+                run = longer
+            moves |= self.shift(run, direction) & empty
+        return moves
+
+    def cells(self, bits: int):
+        """Iterates over the (row, col) of the cells set in the bitboard"""
+        while bits:
+            low = bits & -bits
+            yield divmod(low.bit_length() - 1, self.cols)
+            bits ^= low
+
+
+@functools.lru_cache(maxsize=None)
+def get_geometry(rows: int, cols: int) -> Geometry:
+    """Returns the (shared) geometry of a rows x cols board"""
+    return Geometry(rows, cols)
+
+
+def from_board(board: list[list[str]], color: str) -> tuple[int, int]:
+    """Converts a list board into the bitboards of (color, opponent of color)"""
+    cells = "".join("".join(row) for row in board)[::-1]
+    opponent = othello.WHITE if color == othello.BLACK else othello.BLACK
+    return (
+        int(cells.translate(_bits_table(color)), 2),
+        int(cells.translate(_bits_table(opponent)), 2),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _bits_table(color: str) -> dict:
+    """str.translate table turning the cells of the given color into '1' and the others into '0'"""
+    return str.maketrans(
+        {othello.NONE: "0", othello.BLACK: "0", othello.WHITE: "0", color: "1"}
+    )
@@ -1,15 +1,27 @@
+import argparse
+import inspect
 import time
-from ai.Marti_Da_Silva_Ruhoff import Marti_Da_Silva_Ruhoff
-from ai.MaximumStoneStrategy import MaximumStoneStrategy
-from ai.MaximumStoneStrategyOptimized import MaximumStoneStrategyOptimized
-from ai.Random import Random
-from ai.Strategist import Strategist
 import othello
+import othello_cache
+import othello_clock
+import othello_protocol
+import othello_records
+import othello_registry
+import othello_search
+import othello_workers
 
 
 class OthelloBotEvaluator:
-    def __init__(self, ais: list):
+    def __init__(self, ais: list, workers: dict = None, records: str = None):
+        """
+        With workers, each AI is played in its own worker process, created from the name of
+        its class with these keyword arguments of othello_workers.BotWorker (timeout,
+        memory_limit, cpu_limit, fallback, cache). With records, the games played by evaluate() are
+        appended to this game records file (see othello_records).
+        """
         self.ais = ais
+        self.workers = workers
+        self.records = records
         self.results = {
             "total_games_played": 0,
             "win_rate": 0.0,
@@ -22,6 +34,8 @@ class OthelloBotEvaluator:
             "avg_moves_per_game": 0.0,
             "corner_capture_rate": 0.0,
             "avg_move_time": 0.0,
+            "avg_nodes_per_move": None,
+            "time_loss_rate": 0.0,
             "skipped_turns_rate": 0.0,
             "per_opponent_results": [],
         }
@@ -33,9 +47,15 @@ class OthelloBotEvaluator:
         board_size: tuple[int, int] = (7, 9),
         evaluated_color: str = othello.BLACK,
         opponent_color: str = othello.WHITE,
+        nodes: int = None,
+        time_control: tuple[float, float] = None,
     ) -> dict[str, any]:
         """
-        Play a single game between two AIs and return the results
+        Play a single game between two AIs and return the results. With nodes, the AIs that
+        accept search limits search that many nodes per move, whatever the speed of the machine.
+        With time_control (base time, increment per move) in seconds, each AI has a game clock
+        and loses the game when it runs out of time; the AIs that accept search limits are given
+        their remaining time.
 
         Returns:
             Dictionary containing game results and statistics of a game
@@ -45,7 +65,14 @@ class OthelloBotEvaluator:
         invalid_moves = 0
         corners_captured = 0
         total_move_time = 0
+        total_nodes = 0
+        searched_moves = 0
         skipped_turns = 0
+        clock = None if time_control is None else othello_clock.GameClock(*time_control)
+        # Player who lost on time or by not answering its worker's timeout
+        forfeit = None
+        # Moves played, None for the passes
+        moves = []
 
         corners = [
             (0, 0),
@@ -65,23 +92,51 @@ class OthelloBotEvaluator:
             if not possible_moves:
                 skipped_turns += 1
                 game.switch_turn()
+                moves.append(None)
                 continue
 
+            limits = None
+            if clock is not None:
+                limits = othello_search.SearchLimits(
+                    nodes=nodes, remaining=clock.remaining[current_player], increment=clock.increment
+                )
+                clock.start()
+            elif nodes is not None:
+                limits = othello_search.SearchLimits(nodes=nodes)
+
             start_time = time.time()
             try:
-                move = current_ai.next_move(game.copy_game())
+                move = self._next_move(current_ai, game.copy_game(), limits)
                 move_time = time.time() - start_time
                 total_move_time += move_time
+                if clock is not None:
+                    clock.stop(current_player)
+                    if clock.flagged(current_player):
+                        forfeit = current_player
+                        break
+
+                core = getattr(current_ai, "search", None)
+                if current_ai is evaluated_ai and isinstance(core, othello_search.SearchCore):
+                    total_nodes += core.nodes
+                    searched_moves += 1
 
                 if move in corners:
                     corners_captured += 1
 
                 game.move(move[0], move[1])
                 moves_count += 1
+                moves.append(move)
+                if game.get_turn() == current_player and not game.is_game_over():
+                    # The opponent had to pass
+                    moves.append(None)
 
             except (othello.InvalidMoveException, othello.InvalidTypeException):
                 invalid_moves += 1
                 game.switch_turn()
+                moves.append(None)
+            except othello_workers.MoveTimeout:
+                forfeit = current_player
+                break
 
         black_score, white_score = game.get_scores()
         evaluated_score = (
@@ -92,6 +147,8 @@ class OthelloBotEvaluator:
         )
 
         winner = game.return_winner()
+        if forfeit is not None:
+            winner = othello.BLACK if forfeit == othello.WHITE else othello.WHITE
 
         return {
             "winner": winner,
@@ -100,19 +157,59 @@ class OthelloBotEvaluator:
             "invalid_moves": invalid_moves,
             "corners_captured": corners_captured,
             "avg_move_time": total_move_time / max(moves_count, 1),
+            "avg_nodes_per_move": total_nodes / searched_moves if searched_moves else None,
             "total_pieces": evaluated_score + opponent_score,
             "skipped_turns": skipped_turns,
+            "lost_on_time": forfeit == evaluated_color,
+            "forfeit": forfeit,
+            "moves": moves,
         }
 
+    def _next_move(self, ai, game: othello.OthelloGame, limits) -> tuple[int, int]:
+        """Asks the AI for its move, with the search limits if it accepts them"""
+        core = getattr(ai, "search", None)
+        if isinstance(core, othello_search.SearchCore):
+            # A move played without searching must not count the nodes of the previous one
+            core.nodes = 0
+        if limits is not None and "limits" in inspect.signature(ai.next_move).parameters:
+            return ai.next_move(game, limits)
+        return ai.next_move(game)
+
+    def _worker(self, ai):
+        """Worker process playing the AI, external engines already run in their own process"""
+        if isinstance(ai, (othello_workers.BotWorker, othello_protocol.ExternalEngine)):
+            return ai
+        # A bot searching with ProbCut is created selective again
+        selective = getattr(getattr(ai, "search", None), "probcut", None) is not None
+        return othello_workers.BotWorker(type(ai).__name__, selective=selective, **self.workers)
+
     def evaluate(
         self,
         evaluated_ai,
         number_of_games: int = 100,
         board_size: tuple[int, int] = (7, 9),
+        nodes: int = None,
+        time_control: tuple[float, float] = None,
     ) -> dict[str, any]:
         """
-        Evaluate an AI by playing multiple games against different opponents
+        Evaluate an AI by playing multiple games against different opponents, at a fixed
+        number of nodes per move if nodes is given and with a game clock if time_control is
+        given (see play_game)
         """
+        opponents = self.ais
+        created_workers = []
+        if self.workers is not None:
+            # The workers stay alive for all the games
+            workers = [self._worker(ai) for ai in [evaluated_ai] + self.ais]
+            created_workers = [
+                worker
+                for worker, ai in zip(workers, [evaluated_ai] + self.ais)
+                if worker is not ai
+            ]
+            evaluated_ai, opponents = workers[0], workers[1:]
+
+        writer = None if self.records is None else othello_records.RecordWriter(self.records)
+
         print(f"Evaluating {str(evaluated_ai)}...")
         total_games = 0
         total_wins = 0
@@ -124,11 +221,14 @@ class OthelloBotEvaluator:
         total_moves = 0
         total_corners_captured = 0
         total_move_time = 0
+        total_nodes = 0
+        searched_games = 0
+        total_time_losses = 0
         total_skipped_turns = 0
 
         per_opponent_results = []
 
-        for opponent_ai in self.ais:
+        for opponent_ai in opponents:
             print(f"Playing against {str(opponent_ai)}...")
             opponent_stats = {
                 "name": str(opponent_ai),
@@ -156,7 +256,13 @@ class OthelloBotEvaluator:
                     board_size,
                     evaluated_color,
                     opponent_color,
+                    nodes,
+                    time_control,
                 )
+                if writer is not None:
+                    self._write_record(
+                        writer, result, evaluated_ai, opponent_ai, board_size, evaluated_color
+                    )
 
                 total_games += 1
                 total_invalid_moves += result["invalid_moves"]
@@ -164,7 +270,11 @@ class OthelloBotEvaluator:
                 total_moves += result["moves_count"]
                 total_corners_captured += result["corners_captured"]
                 total_move_time += result["avg_move_time"]
+                if result["avg_nodes_per_move"] is not None:
+                    total_nodes += result["avg_nodes_per_move"]
+                    searched_games += 1
                 total_skipped_turns += result["skipped_turns"]
+                total_time_losses += result["lost_on_time"]
 
                 score_diff = result["scores"][0] - result["scores"][1]
                 total_score_diff += score_diff
@@ -195,12 +305,40 @@ class OthelloBotEvaluator:
             "avg_moves_per_game": total_moves / total_games,
             "corner_capture_rate": total_corners_captured / (4 * total_games),
             "avg_move_time": total_move_time / total_games,
+            "avg_nodes_per_move": total_nodes / searched_games if searched_games else None,
+            "time_loss_rate": total_time_losses / total_games,
             "skipped_turns_rate": total_skipped_turns / total_games,
             "per_opponent_results": per_opponent_results,
         }
 
+        for worker in created_workers:
+            worker.close()
+        if writer is not None:
+            writer.close()
         return self.results
 
+    def _write_record(
+        self, writer, result: dict, evaluated_ai, opponent_ai, board_size, evaluated_color
+    ) -> None:
+        """Appends a game played by play_game() to the records"""
+        if evaluated_color == othello.BLACK:
+            black, white = evaluated_ai, opponent_ai
+            scores = result["scores"]
+        else:
+            black, white = opponent_ai, evaluated_ai
+            scores = result["scores"][::-1]
+        writer.write_game(
+            board_size[0],
+            board_size[1],
+            str(black).strip(),
+            str(white).strip(),
+            result["moves"],
+            scores,
+            forfeit=result["forfeit"],
+        )
+        # The games played so far stay readable if the evaluation is interrupted
+        writer.flush()
+
     def print_results(self) -> None:
         metrics = self.results
         print("\n=== Results for AI ===")
@@ -211,6 +349,7 @@ class OthelloBotEvaluator:
         print(f"Draw rate: {metrics['draw_rate']:.2%}")
         print(f"Loss rate: {metrics['loss_rate']:.2%}")
         print(f"Invalid move rate: {metrics['invalid_move_rate']:.2%}")
+        print(f"Loss on time rate: {metrics['time_loss_rate']:.2%}")
         print(f"Skipped turns per game: {metrics['skipped_turns_rate']:.2f}")
 
         print("\nGame Statistics:")
@@ -222,6 +361,8 @@ class OthelloBotEvaluator:
         print("\nStrategy Metrics:")
         print(f"Corner capture rate: {metrics['corner_capture_rate']:.2%}")
         print(f"Average move time: {metrics['avg_move_time']:.4f} seconds")
+        if metrics["avg_nodes_per_move"] is not None:
+            print(f"Average nodes per move: {metrics['avg_nodes_per_move']:.0f}")
 
         print("\nPer-Opponent Results:")
         for opponent in metrics["per_opponent_results"]:
@@ -240,15 +381,73 @@ class OthelloBotEvaluator:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate an AI against the other AIs")
+    parser.add_argument("--games", type=int, default=2, help="games against each opponent")
+    parser.add_argument(
+        "--nodes", type=int, default=None, help="fixed number of nodes searched per move"
+    )
+    parser.add_argument(
+        "--time", type=float, default=None, help="base time of the game clock in seconds"
+    )
+    parser.add_argument(
+        "--increment", type=float, default=0, help="time added to the clock after each move"
+    )
+    parser.add_argument(
+        "--engine",
+        default=None,
+        help="command of an external engine to evaluate (see othello_protocol)",
+    )
+    parser.add_argument(
+        "--records", default=None, help="file the games are appended to (see othello_records)"
+    )
+    parser.add_argument(
+        "--isolated", action="store_true", help="play each AI in its own worker process"
+    )
+    parser.add_argument(
+        "--move-timeout", type=float, default=None, help="hard time limit of a move (isolated)"
+    )
+    parser.add_argument(
+        "--memory-limit", type=int, default=None, help="memory of a worker in MB (isolated)"
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="keep the evaluations and searches of the bots on disk (see othello_cache)",
+    )
+    parser.add_argument(
+        "--selective",
+        action="store_true",
+        help="the evaluated AI searches with ProbCut (see othello_probcut)",
+    )
+    args = parser.parse_args()
+
+    workers = None
+    if args.isolated:
+        workers = {"timeout": args.move_timeout, "fallback": False, "cache": args.cache}
+        if args.memory_limit is not None:
+            workers["memory_limit"] = args.memory_limit * 1024 * 1024
+
     evaluator = OthelloBotEvaluator(
         [
-            Random(),
-            MaximumStoneStrategy(),
-            MaximumStoneStrategyOptimized(),
-            Strategist(),
-        ]
+            othello_registry.create("Random"),
+            othello_registry.create("MaximumStoneStrategy"),
+            othello_registry.create("MaximumStoneStrategyOptimized"),
+            othello_registry.create("Strategist"),
+        ],
+        workers,
+        args.records,
     )
 
-    ai = Marti_Da_Silva_Ruhoff()
-    evaluator.evaluate(ai, 2)
+    if args.engine is not None:
+        ai = othello_protocol.ExternalEngine(args.engine)
+    else:
+        ai = othello_registry.create("Marti_Da_Silva_Ruhoff", selective=args.selective)
+    if args.cache and workers is None:
+        for bot in evaluator.ais + [ai]:
+            if isinstance(getattr(bot, "search", None), othello_search.SearchCore):
+                othello_cache.attach(bot)
+    time_control = None if args.time is None else (args.time, args.increment)
+    evaluator.evaluate(ai, args.games, nodes=args.nodes, time_control=time_control)
     evaluator.print_results()
+    if args.engine is not None:
+        ai.close()
@@ -0,0 +1,290 @@
+"""
+Persistent cache of the evaluations and search results of a bot, kept from one run to the next.
+
+The games of a tournament keep revisiting the same openings: the cache file of a bot holds the
+evaluations of the early positions (those filling at most EARLY_GAME of the board) and the
+search results (depth, score, best move) of the roots it searched, so the first moves of a game
+cost nothing once they have been searched by a previous run.
+
+The positions are identified by their canonical hash (see othello_position_index.Hasher), so
+symmetric positions share their entries: the evaluations of the bots must be symmetric, and
+they are. The best moves are stored in the canonical orientation.
+
+A cache file is an open-addressing hash table (linear probing, at most half full) of SLOT
+entries after a header holding the code fingerprint of the bot: the sources of its module and
+of the modules of the engine it uses, its weights and its ProbCut parameters. A file with
+another fingerprint is ignored, and overwritten at the next flush. The file is memory-mapped
+read-only at start-up, without reading it; the new entries are kept in memory, then merged
+with the entries of the file at flush() and written to a temporary file which replaces it
+atomically. When two processes flush the same file at the same time, the entries of one of
+them are lost. The file keeps at most max_entries entries, the deepest search results first.
+
+Usage:
+    bot = othello_registry.create("Marti_Da_Silva_Ruhoff")
+    cache = othello_cache.attach(bot)  # flushed at exit, or by cache.close()
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import sys
+import types
+import numpy as np
+import othello
+import othello_position_index
+import othello_search
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "caches")
+
+MAGIC = b"OTHC\x01"
+
+SLOT = np.dtype(
+    [
+        ("key", "<u8"),  # 0 for an empty slot
+        ("value", "<f8"),
+        ("depth", "<u2"),  # 0 for an evaluation
+        ("move", "<u2"),  # cell of the best move in the canonical orientation, NO_MOVE for none
+    ],
+    align=True,
+)
+
+NO_MOVE = 0xFFFF
+
+# Header: magic, fingerprint (sha256), number of slots; the slots start at HEADER_SIZE
+_HEADER = struct.Struct("<5s32sQ")
+HEADER_SIZE = 64
+
+_SLOT = struct.Struct("<QdHH4x")
+
+# Mixed into the canonical hash of the position for the searches of White and the search results
+_WHITE_KEY = 0x9E3779B97F4A7C15
+_SEARCH_KEY = 0xC2B2AE3D27D4EB4F
+
+# Evaluations are kept for the positions whose discs fill at most this fraction of the board
+EARLY_GAME = 0.4
+
+# Entries kept in a cache file, about 48 bytes each on disk
+MAX_ENTRIES = 1 << 19
+
+assert _SLOT.size == SLOT.itemsize
+
+
+def code_fingerprint(bot) -> bytes:
+    """
+    sha256 of what the evaluations and searches of a bot depend on: the sources of its module
+    and of the modules of this directory it imports (recursively), its weights and its ProbCut
+    parameters
+    """
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    pending = [sys.modules[type(bot).__module__]]
+    modules = {}
+    while pending:
+        module = pending.pop()
+        path = getattr(module, "__file__", None)
+        if path is None:  # namespace package, as ai
+            continue
+        path = os.path.abspath(path)
+        if path in modules or not path.startswith(source_dir + os.sep):
+            continue
+        modules[path] = module
+        pending.extend(
+            value for value in vars(module).values() if isinstance(value, types.ModuleType)
+        )
+
+    digest = hashlib.sha256()
+    for path in sorted(modules):
+        digest.update(os.path.relpath(path, source_dir).encode())
+        with open(path, "rb") as source:
+            digest.update(source.read())
+    probcut = getattr(getattr(bot, "search", None), "probcut", None)
+    digest.update(
+        pickle.dumps((getattr(bot, "weights", None), None if probcut is None else vars(probcut)))
+    )
+    return digest.digest()
+
+
+def _open(path: str, fingerprint: bytes) -> mmap.mmap:
+    """Memory map of a cache file, None if it does not exist or has another fingerprint"""
+    try:
+        with open(path, "rb") as cache_file:
+            data = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # missing or empty
+        return None
+    if len(data) < HEADER_SIZE or _HEADER.unpack_from(data)[:2] != (MAGIC, fingerprint):
+        data.close()
+        return None
+    return data
+
+
+def _build_table(entries: np.ndarray) -> np.ndarray:
+    """Open-addressing table of entries with distinct keys, at most half full"""
+    capacity = 1024
+    while capacity < 2 * len(entries):
+        capacity *= 2
+    mask = np.uint64(capacity - 1)
+    table = np.zeros(capacity, dtype=SLOT)
+
+    # Linear probing, one probe per pass for all the entries not placed yet
+    slots = entries["key"] & mask
+    while len(entries):
+        free = np.flatnonzero(table["key"][slots] == 0)
+        # Of the entries probing the same free slot, the first one takes it
+        _, first = np.unique(slots[free], return_index=True)
+        placed = free[first]
+        table[slots[placed]] = entries[placed]
+        waiting = np.ones(len(entries), dtype=bool)
+        waiting[placed] = False
+        entries = entries[waiting]
+        slots = (slots[waiting] + np.uint64(1)) & mask
+    return table
+
+
+def _value(value: float) -> float:
+    """Score read from a file, where it is a float"""
+    if abs(value) >= othello_search.WIN_SCORE:
+        return othello_search.WIN_SCORE if value > 0 else -othello_search.WIN_SCORE
+    return int(value) if value.is_integer() else value
+
+
+class PersistentCache:
+    """Cache file of a bot, see the module documentation"""
+
+    def __init__(self, path: str, fingerprint: bytes, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.hits = 0
+        # key -> (value, depth, canonical move) of the entries added since the last flush
+        self._new = {}
+        self._data = None
+        self._load()
+
+    def _load(self) -> None:
+        self._data = _open(self.path, self.fingerprint)
+        self._mask = 0 if self._data is None else _HEADER.unpack_from(self._data)[2] - 1
+
+    def _find(self, key: int) -> tuple[float, int, int]:
+        """(value, depth, canonical move) of a key, None if it is not in the cache"""
+        entry = self._new.get(key)
+        if entry is not None or self._data is None:
+            return entry
+        index = key & self._mask
+        while True:
+            offset = HEADER_SIZE + index * _SLOT.size
+            stored, value, depth, move = _SLOT.unpack_from(self._data, offset)
+            if stored == key:
+                return _value(value), depth, move
+            if stored == 0:
+                return None
+            index = (index + 1) & self._mask
+
+    @staticmethod
+    def _key(game: othello.OthelloGame, player: str, search: bool) -> tuple[int, int]:
+        """Key of a position searched or evaluated for player, and its symmetry"""
+        hasher = othello_position_index.get_hasher(game.get_rows(), game.get_columns())
+        position, symmetry = hasher.position(game)
+        key = position ^ (_WHITE_KEY if player == othello.WHITE else 0)
+        key ^= _SEARCH_KEY if search else 0
+        return key or 1, symmetry
+
+    def evaluate(self, game: othello.OthelloGame, player: str, evaluate) -> float:
+        """evaluate(game, player), read from the cache for the early positions"""
+        if sum(game.get_scores()) > EARLY_GAME * game.get_rows() * game.get_columns():
+            return evaluate(game, player)
+        key, _ = self._key(game, player, False)
+        entry = self._find(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[0]
+        value = evaluate(game, player)
+        if len(self._new) < self.max_entries:
+            self._new[key] = (value, 0, NO_MOVE)
+        return value
+
+    def search_result(
+        self, game: othello.OthelloGame, player: str
+    ) -> tuple[int, float, tuple[int, int]]:
+        """(depth, score for player, best move) of a previous search of the game, or None"""
+        key, symmetry = self._key(game, player, True)
+        entry = self._find(key)
+        if entry is None:
+            return None
+        self.hits += 1
+        value, depth, cell = entry
+        hasher = othello_position_index.get_hasher(game.get_rows(), game.get_columns())
+        move = divmod(int(hasher.inverses[symmetry, cell]), game.get_columns())
+        return depth, value, move
+
+    def store_search(
+        self, game: othello.OthelloGame, player: str, depth: int, score: float, move: tuple
+    ) -> None:
+        """Keeps the result of a search, unless a deeper one is known"""
+        key, symmetry = self._key(game, player, True)
+        entry = self._find(key)
+        if entry is not None and entry[1] >= depth:
+            return
+        hasher = othello_position_index.get_hasher(game.get_rows(), game.get_columns())
+        cell = int(hasher.permutations[symmetry, move[0] * game.get_columns() + move[1]])
+        self._new[key] = (score, depth, cell)
+
+    def flush(self) -> None:
+        """Merges the new entries into the file, which is replaced atomically"""
+        if not self._new:
+            return
+        entries = np.array(
+            [(key, value, depth, move) for key, (value, depth, move) in self._new.items()],
+            dtype=SLOT,
+        )
+        # The file may have been flushed by another process since it was loaded
+        data = _open(self.path, self.fingerprint)
+        if data is not None:
+            table = np.frombuffer(data, dtype=SLOT, offset=HEADER_SIZE)
+            entries = np.concatenate([entries, table[table["key"] != 0]])
+            del table
+            data.close()
+
+        # One entry per key, the deepest
+        entries = entries[np.lexsort((-entries["depth"].astype(np.int64), entries["key"]))]
+        _, first = np.unique(entries["key"], return_index=True)
+        entries = entries[first]
+        if len(entries) > self.max_entries:
+            entries = entries[np.argsort(-entries["depth"].astype(np.int64), kind="stable")]
+            entries = entries[: self.max_entries]
+        table = _build_table(entries)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temporary = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as cache_file:
+            header = _HEADER.pack(MAGIC, self.fingerprint, len(table))
+            cache_file.write(header.ljust(HEADER_SIZE, b"\0"))
+            table.tofile(cache_file)
+        os.replace(temporary, self.path)
+
+        if self._data is not None:
+            self._data.close()
+        self._load()
+        self._new = {}
+
+    def close(self) -> None:
+        """Flushes the new entries and unmaps the file"""
+        self.flush()
+        if self._data is not None:
+            self._data.close()
+            self._data = None
+
+
+def attach(bot, directory: str = CACHE_DIR, max_entries: int = MAX_ENTRIES) -> PersistentCache:
+    """
+    Gives the search core of a bot the cache file directory/<bot class>.cache, flushed when the
+    process exits normally (the worker processes have to close it themselves)
+    """
+    path = os.path.join(directory, f"{type(bot).__name__}.cache")
+    cache = PersistentCache(path, code_fingerprint(bot), max_entries)
+    bot.search.cache = cache
+    atexit.register(cache.close)
+    return cache
@@ -0,0 +1,120 @@
+"""
+Game clock and time management.
+
+GameClock keeps the remaining time of both players for a time control of a base time plus an
+increment per move (Fischer clock). A player whose remaining time goes below zero loses on time.
+
+TimeManager decides how long a search may think on a move, given the remaining time: a share
+of the clock depending on the number of moves left (from the empty cells), more time for the
+endgame where the search can reach the end of the game, and a MoveTimer which, between two
+iterations of the search, stops it early or gives it more time when the best move is unstable.
+"""
+
+from __future__ import annotations
+
+import time
+import othello
+
+# Moves of the player a budget is computed for, at most: the clock is shared over this horizon
+MOVES_HORIZON = 30
+
+# Below this number of empty cells the search may reach the end of the game: more time
+ENDGAME_EMPTIES = 14
+ENDGAME_FACTOR = 2.0
+
+# Part of the increment spent on each move
+INCREMENT_SHARE = 0.8
+
+# Time never used, kept for the communication with the bot (seconds)
+SAFETY_MARGIN = 0.05
+
+# The hard limit of a move is a multiple of its budget, but never more than this part of the clock
+HARD_FACTOR = 4.0
+HARD_SHARE = 0.4
+
+# Budget multipliers when the best move changes or the score drops between two iterations
+MOVE_CHANGE_FACTOR = 1.5
+SCORE_DROP_FACTOR = 1.3
+SCORE_DROP = 10
+
+
+class GameClock:
+    """Remaining time of both players, in seconds"""
+
+    def __init__(self, base: float, increment: float = 0):
+        self.base = base
+        self.increment = increment
+        self.remaining = {othello.BLACK: base, othello.WHITE: base}
+        self._started = None
+
+    def start(self) -> None:
+        """Starts the clock of the player to move"""
+        self._started = time.monotonic()
+
+    def stop(self, color: str) -> float:
+        """Stops the clock of color after its move and returns the time it took"""
+        elapsed = time.monotonic() - self._started
+        self.remaining[color] -= elapsed
+        if self.remaining[color] >= 0:
+            self.remaining[color] += self.increment
+        self._started = None
+        return elapsed
+
+    def flagged(self, color: str) -> bool:
+        """True if color has run out of time"""
+        return self.remaining[color] < 0
+
+
+class MoveTimer:
+    """Time budget of one move, updated after each iteration of the search"""
+
+    def __init__(self, budget: float, hard_limit: float):
+        self.budget = budget
+        self.hard_limit = hard_limit
+        self._last_time = 0.0
+        self._branching = None
+        self._last_move = None
+        self._last_score = None
+
+    def next_iteration(self, move: tuple[int, int], score: float, elapsed: float) -> bool:
+        """
+        Called after each completed iteration with its best move, score and the time spent
+        since the start of the search; returns False if the next iteration should not start
+        """
+        iteration_time = elapsed - self._last_time
+        if self._last_time > 0 and iteration_time > 0:
+            self._branching = iteration_time / self._last_time
+        self._last_time = elapsed
+
+        if self._last_move is not None and move != self._last_move:
+            self.budget = min(self.budget * MOVE_CHANGE_FACTOR, self.hard_limit)
+        if self._last_score is not None and score < self._last_score - SCORE_DROP:
+            self.budget = min(self.budget * SCORE_DROP_FACTOR, self.hard_limit)
+        self._last_move = move
+        self._last_score = score
+
+        if elapsed >= self.budget:
+            return False
+        # The next iteration is expected to take a branching factor times longer
+        if self._branching is not None:
+            return elapsed + iteration_time * self._branching <= self.hard_limit
+        return True
+
+
+class TimeManager:
+    """Allocates the time of a move from the remaining time on the clock"""
+
+    def move_timer(
+        self, game: othello.OthelloGame, remaining: float, increment: float = 0
+    ) -> MoveTimer:
+        """Returns the budget of the next move of game"""
+        empties = game.get_rows() * game.get_columns() - sum(game.get_scores())
+        moves_left = max(1, min(MOVES_HORIZON, (empties + 1) // 2))
+        available = max(0.0, remaining - SAFETY_MARGIN)
+
+        budget = available / moves_left + INCREMENT_SHARE * increment
+        if empties <= ENDGAME_EMPTIES:
+            budget *= ENDGAME_FACTOR
+        hard_limit = min(budget * HARD_FACTOR, available * HARD_SHARE + increment)
+        hard_limit = min(hard_limit, available)
+        return MoveTimer(min(budget, hard_limit), hard_limit)
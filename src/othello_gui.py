@@ -1,9 +1,22 @@
 """ This is the main file for the Othello game. It creates the game and the GUI and starts the game.
+
+    Bot matches can also be watched at full speed (run_auto with render_every) or played
+    without any window, and recorded games replayed (see main).
 """
 
-import importlib
+import argparse
+import itertools
+import queue
+import threading
+import time
 import othello
+import othello_analysis
 import othello_models
+import othello_ponder
+import othello_protocol
+import othello_records
+import othello_registry
+import othello_search
 import tkinter
 
 # Default / Initial Game Settings
@@ -15,17 +28,98 @@ BACKGROUND_COLOR = othello_models.BACKGROUND_COLOR
 GAME_HEIGHT = 400
 GAME_WIDTH = 400
 WAITING_TIME = 500  # adding an extra time in ms to better see the development
+POLL_INTERVAL = 50  # ms between two checks of the AI thinking in the background
+RESIZE_DELAY = 100  # ms without resize events before the board is redrawn
+
+
+def load_ai(name: str, ponder: bool = False, selective: bool = False):
+    """
+    Creates the AI of the given name, "engine:<command>" for an external engine. With selective,
+    the bots which support it search with ProbCut.
+    """
+    if name.startswith(othello_protocol.ENGINE_PREFIX):
+        return othello_protocol.ExternalEngine(name[len(othello_protocol.ENGINE_PREFIX) :])
+    if ponder:
+        return othello_ponder.PonderingBot(name, selective=selective)
+    # The bot and its caches are kept from one game to the next
+    return othello_registry.get_bot(name, selective)
+
+
+def play_auto(game: othello.OthelloGame, next_move, on_move=None, waiting_time=0, stop=None):
+    """
+    Plays the game to its end in a plain loop, without the Tk event loop: next_move(game) gives
+    the move of the player to move, on_move(game, delta) is called after each move and
+    waiting_time (ms) is waited between two moves. Returns False if stop (a threading.Event)
+    was set before the end of the game.
+    """
+    while not game.is_game_over():
+        if stop is not None and stop.is_set():
+            return False
+        delta = game.move(*next_move(game), return_delta=True)
+        if on_move is not None:
+            on_move(game, delta)
+        if waiting_time:
+            time.sleep(waiting_time / 1000)
+    return True
+
+
+def bots_moves(black_ai, white_ai):
+    """next_move function of play_auto for a game between two AIs"""
+    return lambda game: (black_ai if game.get_turn() == othello.BLACK else white_ai).next_move(
+        game.copy_game()
+    )
+
+
+def record_moves(record: othello_records.GameRecord):
+    """next_move function of play_auto replaying a recorded game"""
+    # OthelloGame.move() plays the recorded passes by itself
+    moves = iter([move for move in record.moves() if move is not None])
+    return lambda game: next(moves)
 
 
 class OthelloGUI:
-    def __init__(self, black_name="Human", white_name="Human"):
+    def __init__(
+        self,
+        black_name="Human",
+        white_name="Human",
+        ponder=False,
+        waiting_time=WAITING_TIME,
+        rows=DEFAULT_ROWS,
+        columns=DEFAULT_COLUMNS,
+        selective=False,
+    ):
         # Initial Game Settings
-        self._rows = DEFAULT_ROWS
-        self._columns = DEFAULT_COLUMNS
+        self._rows = rows
+        self._columns = columns
         self._black_name = black_name
         self._white_name = white_name
         self._black_ai = None
         self._white_ai = None
+        # With ponder, the AIs run in background processes and think on the opponent's time
+        self._ponder = ponder
+        self._waiting_time = waiting_time
+        # Set to end the match of run_auto
+        self._auto_stop = threading.Event()
+
+        # The AIs think in a background thread and send their moves and search progress to
+        # this queue, read by _poll_ai. Messages of an older thinking (cancelled, or of a
+        # previous game) are recognized by their thinking number and ignored.
+        self._ai_messages = queue.Queue()
+        self._thinking = 0
+        self._thinking_ai = None
+        self._thinking_started = None
+        # Thread of the last thinking: an AI must not be asked for a move while it still runs,
+        # even cancelled, so the next thinking is deferred until it has ended
+        self._ai_thread = None
+        self._ai_deferred = False
+        self._pending_redraw = None
+
+        # Positions before each move of the game, for Take Back Move
+        self._history = []
+        # Background analysis of the positions (AI > Analysis), its scores of the moves are
+        # sent to this queue, also read by _poll_ai
+        self._analyser = None
+        self._analysis_messages = queue.Queue()
 
         # Create the OthelloGame gamestate here (drawn from the original othello game code)
         self._game_state = othello.OthelloGame(self._rows, self._columns, othello.BLACK)
@@ -45,6 +139,7 @@ class OthelloGUI:
             othello.WHITE, self._game_state, self._root_window
         )
         self._player_turn = othello_models.Turn(self._game_state, self._root_window)
+        self._thinking_status = othello_models.Thinking(self._root_window)
 
         # Bind my game board with these two events.
         self._board.get_board().bind("<Configure>", self._on_board_resized)
@@ -54,12 +149,25 @@ class OthelloGUI:
         self._menu_bar = tkinter.Menu(self._root_window)
         self._game_menu = tkinter.Menu(self._menu_bar, tearoff=0)
         self._game_menu.add_command(label="New Game", command=self._new_game)
+        self._game_menu.add_command(label="Take Back Move", command=self._take_back)
         self._game_menu.add_command(
             label="Game Settings", command=self._configure_game_settings
         )
         self._game_menu.add_separator()
         self._game_menu.add_command(label="Exit", command=self._root_window.destroy)
         self._menu_bar.add_cascade(label="Game", menu=self._game_menu)
+        self._ai_menu = tkinter.Menu(self._menu_bar, tearoff=0)
+        self._ai_menu.add_command(label="Move Now", command=self._force_ai_move)
+        self._ai_menu.add_command(label="Cancel Thinking", command=self._cancel_ai)
+        self._ai_menu.add_separator()
+        self._analysis_enabled = tkinter.BooleanVar(master=self._root_window, value=False)
+        self._ai_menu.add_checkbutton(
+            label="Analysis", variable=self._analysis_enabled, command=self._toggle_analysis
+        )
+        # Used by the AIs of the next game
+        self._selective = tkinter.BooleanVar(master=self._root_window, value=selective)
+        self._ai_menu.add_checkbutton(label="Selective Search", variable=self._selective)
+        self._menu_bar.add_cascade(label="AI", menu=self._ai_menu)
 
         # Layout all the widgets here using grid layout
         self._root_window.config(menu=self._menu_bar)
@@ -78,6 +186,7 @@ class OthelloGUI:
         self._player_turn.get_turn_label().grid(
             row=3, column=0, columnspan=2, padx=10, pady=10
         )
+        self._thinking_status.get_thinking_label().grid(row=4, column=0, columnspan=2)
 
         # Configure the root window's row/column weight (from the grid layout)
         self._root_window.rowconfigure(0, weight=1)
@@ -87,19 +196,74 @@ class OthelloGUI:
         self._root_window.columnconfigure(1, weight=1)
         self.cb_timer_idx = []
         self.update_timer()
+        self._root_window.after(POLL_INTERVAL, self._poll_ai)
 
     def start(self) -> None:
         """Runs the mainloop of the root window"""
         self._root_window.mainloop()
 
-    def run_auto(self) -> None:
-        """Runs the game without having to click"""
+    def run_auto(self, render_every: int = None, games: int = 1) -> None:
+        """Runs the game without having to click
+
+        With render_every, the games are played at full speed in a background loop and the
+        board is only drawn every render_every moves (0: only the final position), waiting
+        waiting_time ms between two moves.
+        """
 
         print(f"Run_auto: {self._black_name} vs {self._white_name}")
-        self._root_window.after(200, self._new_game)
+        if render_every is None:
+            self._root_window.after(200, self._new_game)
+        else:
+            black_ai = load_ai(self._black_name, self._ponder, self._selective.get())
+            white_ai = load_ai(self._white_name, self._ponder, self._selective.get())
+            next_move = bots_moves(black_ai, white_ai)
+            games = [
+                (othello.OthelloGame(self._rows, self._columns, othello.BLACK), next_move)
+                for _ in range(games)
+            ]
+            self._start_auto(games, render_every)
 
         self.start()  # mainloop blocks the execution of other instructions
 
+    def replay(self, record: othello_records.GameRecord, render_every: int = 1) -> None:
+        """Replays a recorded game, a move every waiting_time ms"""
+        self._rows = record.rows
+        self._columns = record.cols
+        self._black_name = record.black
+        self._white_name = record.white
+        game = othello.OthelloGame(record.rows, record.cols, record.first_player())
+        self._start_auto([(game, record_moves(record))], render_every)
+        self.start()
+
+    def _start_auto(self, games: list, render_every: int) -> None:
+        """Plays the (game, next_move) of games one after the other in a background thread"""
+        self._thinking += 1
+        self._auto_stop = threading.Event()
+        threading.Thread(
+            target=self._auto_loop,
+            args=(games, render_every, self._thinking, self._auto_stop),
+            daemon=True,
+        ).start()
+
+    def _auto_loop(self, games: list, render_every: int, thinking: int, stop) -> None:
+        """Runs in the background thread: sends the positions to draw to the Tk loop"""
+        deltas = []
+
+        def on_move(game, delta):
+            deltas.append(delta)
+            if render_every and len(deltas) >= render_every:
+                self._ai_messages.put((thinking, "position", (game.copy_game(), deltas[:])))
+                deltas.clear()
+
+        for game, next_move in games:
+            self._ai_messages.put((thinking, "game", game.copy_game()))
+            deltas.clear()
+            if not play_auto(game, next_move, on_move, self._waiting_time, stop):
+                return
+            self._ai_messages.put((thinking, "position", (game.copy_game(), deltas[:])))
+            black, white = game.get_scores()
+            print(f"{self._black_name} {black} - {white} {self._white_name}")
+
     def _configure_game_settings(self) -> None:
         """Pops out an options window to configure the game settings"""
         dialog = othello_models.OptionDialog(
@@ -111,8 +275,6 @@ class OthelloGUI:
             self._columns = dialog.get_columns()
             self._black_name = dialog.get_black_name()
             self._white_name = dialog.get_white_name()
-            self._black_ai = None
-            self._white_ai = None
             # Create a new game with these settings now
             self._new_game()
 
@@ -128,21 +290,30 @@ class OthelloGUI:
         self._white_score.update_score(self._game_state)
 
         self._player_turn.update_turn(othello.BLACK)
+        self._history = []
+        self._update_analysis()
 
         [self._root_window.after_cancel(idx) for idx in self.cb_timer_idx]
         self.cb_timer_idx = []
         # self.update_timer()
 
+        self._auto_stop.set()
+        self._cancel_ai()
+        for ai in (self._black_ai, self._white_ai):
+            if isinstance(ai, (othello_ponder.PonderingBot, othello_protocol.ExternalEngine)):
+                ai.close()
+        self._black_ai = None
+        self._white_ai = None
         if self._white_name != "Human":  # import the ai module if not human
-            self._white_ai = getattr(
-                importlib.import_module(f"ai.{self._white_name}"), f"{self._white_name}"
-            )()
+            self._white_ai = self._load_ai(self._white_name)
         if self._black_name != "Human":  # imports the ai module if not human
-            self._black_ai = getattr(
-                importlib.import_module(f"ai.{self._black_name}"), f"{self._black_name}"
-            )()
+            self._black_ai = self._load_ai(self._black_name)
             self._play_ai()
 
+    def _load_ai(self, name: str):
+        """Creates the AI of the given name, "engine:<command>" for an external engine"""
+        return load_ai(name, self._ponder, self._selective.get())
+
     def update_timer(self):
         self.cb_timer_idx.append(self._root_window.after(500, self.update_timer))
         self._player_turn.update_turn_text()
@@ -164,11 +335,14 @@ class OthelloGUI:
 
     def _play(self, row, col):
         try:
-            self._game_state.move(row, col)
+            previous = self._game_state.copy_game()
+            delta = self._game_state.move(row, col, return_delta=True)
+            self._history.append(previous)
             self._board.update_game_state(self._game_state)
-            self._board.redraw_board()
+            self._board.update_cells(delta)
             self._black_score.update_score(self._game_state)
             self._white_score.update_score(self._game_state)
+            self._update_analysis()
 
             if self._game_state.is_game_over():
                 self._player_turn.display_winner(self._game_state.return_winner())
@@ -176,7 +350,7 @@ class OthelloGUI:
                 self.cb_timer_idx = []
             else:
                 self._player_turn.switch_turn(self._game_state)
-                self._root_window.after(WAITING_TIME, self._play_ai)
+                self._play_ai()
 
         except othello.InvalidMoveException:
             if (
@@ -213,23 +387,235 @@ class OthelloGUI:
         return row, col
 
     def _on_board_resized(self, event: tkinter.Event) -> None:
-        """Called whenever the canvas is resized"""
+        """Called whenever the canvas is resized, redraws it once the resizing is over"""
+        if self._pending_redraw is not None:
+            self._root_window.after_cancel(self._pending_redraw)
+        self._pending_redraw = self._root_window.after(RESIZE_DELAY, self._redraw_resized)
+
+    def _redraw_resized(self) -> None:
+        self._pending_redraw = None
         self._board.redraw_board()
 
     def _play_ai(self):
-        """Plays an AI move"""
-        if self._game_state.get_turn() == othello.BLACK and self._black_ai is not None:
-            move = self._black_ai.next_move(self._game_state.copy_game())
-            self._play(move[0], move[1])
-        elif (
-            self._game_state.get_turn() == othello.WHITE and self._white_ai is not None
-        ):
-            move = self._white_ai.next_move(self._game_state.copy_game())
+        """Starts the AI to move thinking in the background, its move is played by _poll_ai"""
+        if self._game_state.get_turn() == othello.BLACK:
+            ai = self._black_ai
+        else:
+            ai = self._white_ai
+        if ai is None or self._thinking_ai is not None:
+            return
+        if self._ai_thread is not None and self._ai_thread.is_alive():
+            # Started by _poll_ai once the thread has ended
+            self._ai_deferred = True
+            return
+        self._ai_deferred = False
+        self._thinking += 1
+        self._thinking_ai = ai
+        self._thinking_started = time.monotonic()
+        self._thinking_status.start()
+        game = self._game_state.copy_game()
+        core = getattr(ai, "search", None)
+        # Searched directly to report its progress and to be stopped on demand
+        searched = isinstance(core, othello_search.SearchCore)
+        searched = searched and len(set(game.get_possible_move())) > 1
+        if searched:
+            core.prepare_search()
+        self._ai_thread = threading.Thread(
+            target=self._think, args=(ai, game, searched, self._thinking), daemon=True
+        )
+        self._ai_thread.start()
+
+    def _think(self, ai, game: othello.OthelloGame, searched: bool, thinking: int) -> None:
+        """Runs in the background thread: sends the progress and the move of the AI"""
+        try:
+            if searched:
+                progress = lambda info: self._ai_messages.put((thinking, "info", info))
+                _, move = ai.search.search(game, game.get_turn(), None, progress)
+            else:
+                move = ai.next_move(game)
+        except Exception as error:
+            self._ai_messages.put((thinking, "error", error))
+            return
+        self._ai_messages.put((thinking, "move", move))
+
+    def _poll_ai(self) -> None:
+        """Handles the messages of the AI thinking, in the Tk loop"""
+        self._root_window.after(POLL_INTERVAL, self._poll_ai)
+        self._poll_analysis()
+        if self._ai_deferred and not self._ai_thread.is_alive():
+            self._play_ai()
+        while True:
+            try:
+                thinking, kind, value = self._ai_messages.get_nowait()
+            except queue.Empty:
+                return
+            if thinking != self._thinking:
+                continue
+            if kind == "game":
+                self._show_auto_game(value)
+            elif kind == "position":
+                self._show_auto_position(*value)
+            elif self._thinking_ai is None:
+                continue
+            elif kind == "info":
+                self._thinking_status.update_info(value)
+            elif kind == "error":
+                # The AI does not move anymore, Move Now asks it again
+                self._thinking_ai = None
+                self._thinking_status.show_error(value)
+            else:
+                self._thinking_ai = None
+                self._thinking_status.clear()
+                # The AI thought during the WAITING_TIME, only the rest of it is waited
+                elapsed = int((time.monotonic() - self._thinking_started) * 1000)
+                self._root_window.after(
+                    max(0, self._waiting_time - elapsed), self._play_ai_move, thinking, value
+                )
+
+    def _show_auto_game(self, game: othello.OthelloGame) -> None:
+        """Shows the start of a game of the run_auto loop"""
+        self._game_state = game
+        self._board.new_game_settings(game)
+        self._board.redraw_board()
+        self._black_player.update_name(self._black_name)
+        self._white_player.update_name(self._white_name)
+        self._show_auto_position(game, [])
+
+    def _show_auto_position(self, game: othello.OthelloGame, deltas: list) -> None:
+        """Draws a position of the run_auto loop, deltas being the moves since the last one"""
+        self._game_state = game
+        self._board.update_game_state(game)
+        for delta in deltas:
+            self._board.update_cells(delta)
+        self._black_score.update_score(game)
+        self._white_score.update_score(game)
+        if game.is_game_over():
+            self._player_turn.display_winner(game.return_winner())
+        else:
+            self._player_turn.switch_turn(game)
+
+    def _take_back(self) -> None:
+        """Goes back to the position before the last move, the AIs wait for Move Now"""
+        if not self._history:
+            return
+        self._cancel_ai()
+        self._game_state = self._history.pop()
+        self._board.update_game_state(self._game_state)
+        self._board.redraw_board()
+        self._black_score.update_score(self._game_state)
+        self._white_score.update_score(self._game_state)
+        self._player_turn.switch_turn(self._game_state)
+        self._update_analysis()
+
+    def _toggle_analysis(self) -> None:
+        if self._analysis_enabled.get() and self._analyser is None:
+            self._analyser = othello_analysis.Analyser(
+                progress=lambda *result: self._analysis_messages.put(result)
+            )
+        self._update_analysis()
+
+    def _update_analysis(self) -> None:
+        """Analyses the current position, or stops analysing if the analysis is off"""
+        self._board.clear_scores()
+        if self._analyser is None:
+            return
+        if not self._analysis_enabled.get():
+            self._analyser.stop()
+            return
+        cached = self._analyser.cached(self._game_state)
+        if cached is not None:
+            self._board.show_scores(cached[1])
+        self._analyser.analyse(self._game_state)
+
+    def _poll_analysis(self) -> None:
+        """Draws the scores of the last completed depth of the analysis of the position"""
+        current = othello_ponder.position_key(self._game_state)
+        while True:
+            try:
+                key, depth, scores = self._analysis_messages.get_nowait()
+            except queue.Empty:
+                return
+            if key == current and self._analysis_enabled.get():
+                self._board.show_scores(scores)
+
+    def _play_ai_move(self, thinking: int, move: tuple[int, int]) -> None:
+        if thinking == self._thinking:
             self._play(move[0], move[1])
 
+    def _force_ai_move(self) -> None:
+        """Makes the AI play the best move found so far, or starts it if it was cancelled"""
+        if self._thinking_ai is None:
+            self._play_ai()
+        elif isinstance(getattr(self._thinking_ai, "search", None), othello_search.SearchCore):
+            self._thinking_ai.search.stop()
+
+    def _cancel_ai(self) -> None:
+        """Stops the AI thinking, without playing (Move Now starts it again)"""
+        self._ai_deferred = False
+        if self._thinking_ai is None:
+            return
+        core = getattr(self._thinking_ai, "search", None)
+        if isinstance(core, othello_search.SearchCore):
+            core.stop()
+        self._thinking += 1
+        self._thinking_ai = None
+        self._thinking_status.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Othello game")
+    parser.add_argument("--black", default="Human", help="bot playing Black")
+    parser.add_argument("--white", default="Human", help="bot playing White")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS)
+    parser.add_argument("--columns", type=int, default=DEFAULT_COLUMNS)
+    parser.add_argument("--games", type=int, default=1, help="games of a bot match")
+    parser.add_argument(
+        "--render-every", type=int, help="play at full speed, drawing every N moves (0: last)"
+    )
+    parser.add_argument("--waiting-time", type=int, default=WAITING_TIME, help="ms")
+    parser.add_argument("--headless", action="store_true", help="bot match without window")
+    parser.add_argument("--replay", help="records file of a game to replay")
+    parser.add_argument("--game-index", type=int, default=0, help="game of --replay")
+    parser.add_argument(
+        "--selective", action="store_true", help="the bots search with ProbCut if they can"
+    )
+    args = parser.parse_args()
+
+    if args.headless:
+        for name in (args.black, args.white):
+            if name == "Human" or name not in othello_registry.bot_names():
+                parser.error(f"--headless needs two bots, not {name}")
+        black_ai = load_ai(args.black, selective=args.selective)
+        white_ai = load_ai(args.white, selective=args.selective)
+        for _ in range(args.games):
+            game = othello.OthelloGame(args.rows, args.columns, othello.BLACK)
+            play_auto(game, bots_moves(black_ai, white_ai))
+            black, white = game.get_scores()
+            print(f"{args.black} {black} - {white} {args.white}")
+        return
+
+    if args.replay is not None:
+        with othello_records.RecordReader(args.replay) as reader:
+            record = next(itertools.islice(reader, args.game_index, None), None)
+        if record is None:
+            parser.error(f"{args.replay} has no game {args.game_index}")
+        gui = OthelloGUI(waiting_time=args.waiting_time)
+        gui.replay(record, args.render_every or 1)
+        return
+
+    gui = OthelloGUI(
+        args.black, args.white, False, args.waiting_time, args.rows, args.columns, args.selective
+    )
+    if args.black != "Human" and args.white != "Human":
+        gui.run_auto(args.render_every, args.games)
+    else:
+        if args.black != "Human" or args.white != "Human":
+            gui._new_game()
+        gui.start()
+
 
 if __name__ == "__main__":
-    OthelloGUI().start()
+    main()
 
     # For testing purposes (without having to click)
     # OthelloGUI(black_name="Random", white_name="Random").run_auto()
@@ -0,0 +1,271 @@
+"""
+Incremental evaluation along the search path.
+
+An incremental evaluator computes its features once with reset(), then keeps them up to date
+with the MoveDelta records returned by OthelloGame.move(..., return_delta=True): apply_delta()
+when a move is played, revert_delta() when it is taken back. Evaluating a leaf then costs
+O(flips) instead of a scan of the whole board.
+
+IncrementalFeatures is the evaluation of the FeatureStrategist bot. Its incremental updates are
+checked against the features computed from scratch, at every leaf of searches along random
+games, by:
+    python othello_incremental.py --games 20
+"""
+
+from __future__ import annotations
+
+import abc
+import argparse
+import functools
+import random
+import othello
+import othello_bitboard
+import othello_search
+import othello_stability
+
+# Ternary code of the cells in the edge pattern indices
+CODES = {othello.NONE: 0, othello.BLACK: 1, othello.WHITE: 2}
+
+DEFAULT_WEIGHTS = {
+    "discs": 0,
+    "squares": 1,
+    "frontier": -1,
+    "edge_stability": 5,
+}
+
+
+class IncrementalEvaluator(abc.ABC):
+    """Protocol of the evaluators maintained along the search path"""
+
+    @abc.abstractmethod
+    def reset(self, game: othello.OthelloGame) -> None:
+        """Computes the features of the game from scratch"""
+
+    @abc.abstractmethod
+    def apply_delta(self, delta: othello.MoveDelta) -> None:
+        """Updates the features after the move of the delta has been played"""
+
+    @abc.abstractmethod
+    def revert_delta(self, delta: othello.MoveDelta) -> None:
+        """Updates the features after the move of the delta has been taken back"""
+
+    @abc.abstractmethod
+    def evaluate(self, game: othello.OthelloGame, player: str) -> float:
+        """Returns the score of the current position from the player's point of view"""
+
+
+def square_weights(rows: int, cols: int) -> list[int]:
+    """
+    Default square weights of a board, row by row: corners are worth a lot, the cells next to
+    them give the corner away and the other edge cells are slightly good.
+    """
+    weights = [0] * (rows * cols)
+    for row in range(rows):
+        for col in range(cols):
+            if row in (0, rows - 1) or col in (0, cols - 1):
+                weights[row * cols + col] = 1
+    for corner_row, d_row in ((0, 1), (rows - 1, -1)):
+        for corner_col, d_col in ((0, 1), (cols - 1, -1)):
+            weights[corner_row * cols + corner_col] = 20
+            weights[(corner_row + d_row) * cols + corner_col] = -3
+            weights[corner_row * cols + corner_col + d_col] = -3
+            weights[(corner_row + d_row) * cols + corner_col + d_col] = -7
+    return weights
+
+
+@functools.lru_cache(maxsize=None)
+def edge_stability_table(length: int) -> list[int]:
+    """
+    Black stable discs minus white stable discs of every edge configuration, indexed by
+    the ternary pattern index of the edge (see CODES)
+    """
+    ternary, table = othello_stability.edge_table(length)
+    full = (1 << length) - 1
+    values = [0] * len(table)
+    for black in range(1 << length):
+        free = full & ~black
+        white = free
+        while True:
+            stable = table[ternary[black] + 2 * ternary[white]]
+            values[ternary[black] + 2 * ternary[white]] = (
+                bin(stable & black).count("1") - bin(stable & white).count("1")
+            )
+            if white == 0:
+                break
+            white = (white - 1) & free
+    return values
+
+
+class IncrementalFeatures(IncrementalEvaluator):
+    """
+    Additive features kept along the search path: disc counts, square-weight sums, frontier
+    counts (discs next to an empty cell) and the ternary pattern index of each edge, scored
+    through the edge stability tables.
+    """
+
+    def __init__(self, weights: dict[str, float] = None):
+        self.weights = DEFAULT_WEIGHTS if weights is None else weights
+        self.rows = None
+        self.cols = None
+
+    def _init_geometry(self, rows: int, cols: int) -> None:
+        """Builds the per-geometry tables"""
+        geometry = othello_bitboard.get_geometry(rows, cols)
+        self.rows = rows
+        self.cols = cols
+        self.square_weights = square_weights(rows, cols)
+        self.neighbours = [
+            [
+                (row + d_row) * cols + col + d_col
+                for d_row, d_col in othello_bitboard.DIRECTIONS
+                if geometry.is_inside(row + d_row, col + d_col)
+            ]
+            for row in range(rows)
+            for col in range(cols)
+        ]
+        # (edge, power of 3) of each cell in the edge pattern indices
+        self.edge_lengths = [len(edge) for edge in geometry.edges]
+        self.cell_edges = [[] for _ in range(rows * cols)]
+        for edge_index, edge in enumerate(geometry.edges):
+            for position, cell in enumerate(edge):
+                self.cell_edges[cell].append((edge_index, 3**position))
+
+    def reset(self, game: othello.OthelloGame) -> None:
+        if (self.rows, self.cols) != (game.get_rows(), game.get_columns()):
+            self._init_geometry(game.get_rows(), game.get_columns())
+
+        self.cells = [cell for row in game.get_board() for cell in row]
+        self.discs = {othello.BLACK: 0, othello.WHITE: 0, othello.NONE: 0}
+        self.squares = {othello.BLACK: 0, othello.WHITE: 0, othello.NONE: 0}
+        self.frontier = {othello.BLACK: 0, othello.WHITE: 0, othello.NONE: 0}
+        self.edge_indices = [0] * len(self.edge_lengths)
+        self.empty_neighbours = [
+            sum(self.cells[neighbour] == othello.NONE for neighbour in neighbours)
+            for neighbours in self.neighbours
+        ]
+
+        for index, color in enumerate(self.cells):
+            self.discs[color] += 1
+            self.squares[color] += self.square_weights[index]
+            if self.empty_neighbours[index]:
+                self.frontier[color] += 1
+            for edge_index, power in self.cell_edges[index]:
+                self.edge_indices[edge_index] += power * CODES[color]
+
+    def apply_delta(self, delta: othello.MoveDelta) -> None:
+        other = othello.BLACK if delta.color == othello.WHITE else othello.WHITE
+        for row, col in delta.flipped:
+            self._recolor(row * self.cols + col, other, delta.color)
+        self._place(delta.row * self.cols + delta.col, delta.color)
+
+    def revert_delta(self, delta: othello.MoveDelta) -> None:
+        other = othello.BLACK if delta.color == othello.WHITE else othello.WHITE
+        self._remove(delta.row * self.cols + delta.col, delta.color)
+        for row, col in delta.flipped:
+            self._recolor(row * self.cols + col, delta.color, other)
+
+    def _recolor(self, index: int, old: str, new: str) -> None:
+        """Flips the disc of a cell from old to new"""
+        self.cells[index] = new
+        self.discs[old] -= 1
+        self.discs[new] += 1
+        self.squares[old] -= self.square_weights[index]
+        self.squares[new] += self.square_weights[index]
+        if self.empty_neighbours[index]:
+            self.frontier[old] -= 1
+            self.frontier[new] += 1
+        for edge_index, power in self.cell_edges[index]:
+            self.edge_indices[edge_index] += power * (CODES[new] - CODES[old])
+
+    def _place(self, index: int, color: str) -> None:
+        """Puts a disc of color on an empty cell"""
+        self._recolor(index, othello.NONE, color)
+        for neighbour in self.neighbours[index]:
+            self.empty_neighbours[neighbour] -= 1
+            if self.empty_neighbours[neighbour] == 0:
+                self.frontier[self.cells[neighbour]] -= 1
+
+    def _remove(self, index: int, color: str) -> None:
+        """Takes the disc of color back from a cell, inverse of _place()"""
+        for neighbour in self.neighbours[index]:
+            if self.empty_neighbours[neighbour] == 0:
+                self.frontier[self.cells[neighbour]] += 1
+            self.empty_neighbours[neighbour] += 1
+        self._recolor(index, color, othello.NONE)
+
+    def edge_stability(self) -> int:
+        """Black stable edge discs minus white stable edge discs"""
+        value = 0
+        for length, index in zip(self.edge_lengths, self.edge_indices):
+            if length <= othello_stability.EXACT_EDGE_LENGTH:
+                value += edge_stability_table(length)[index]
+            else:
+                black = white = 0
+                for position in range(length):
+                    index, code = divmod(index, 3)
+                    black |= (code == 1) << position
+                    white |= (code == 2) << position
+                stable = othello_stability.edge_stable(length, black, white)
+                value += bin(stable & black).count("1") - bin(stable & white).count("1")
+        return value
+
+    def features(self, player: str) -> dict[str, float]:
+        """Returns the features as differences between the player and his opponent"""
+        other = othello.BLACK if player == othello.WHITE else othello.WHITE
+        edge_stability = self.edge_stability()
+        return {
+            "discs": self.discs[player] - self.discs[other],
+            "squares": self.squares[player] - self.squares[other],
+            "frontier": self.frontier[player] - self.frontier[other],
+            "edge_stability": edge_stability if player == othello.BLACK else -edge_stability,
+        }
+
+    def evaluate(self, game: othello.OthelloGame, player: str) -> float:
+        features = self.features(player)
+        return sum(weight * features[name] for name, weight in self.weights.items())
+
+
+def check(games: int, depth: int, seed: int = None) -> int:
+    """
+    Searches every position of random games with IncrementalFeatures and compares, at each
+    leaf, its evaluation with that of features computed from scratch. Returns the number of
+    leaves checked, raises AssertionError at the first difference.
+    """
+    rng = random.Random(seed)
+    features = IncrementalFeatures()
+    scratch = IncrementalFeatures()
+    leaves = 0
+
+    def evaluate(game: othello.OthelloGame, player: str) -> float:
+        nonlocal leaves
+        scratch.reset(game)
+        value = features.evaluate(game, player)
+        expected = scratch.evaluate(game, player)
+        assert value == expected, f"{value} instead of {expected}"
+        leaves += 1
+        return value
+
+    core = othello_search.SearchCore(evaluate, depth, incremental=features)
+    for _ in range(games):
+        game = othello.OthelloGame(8, 8, othello.BLACK)
+        while not game.is_game_over():
+            core.alpha_beta(
+                game, depth, -othello_search.INFINITY, othello_search.INFINITY, game.get_turn()
+            )
+            move = rng.choice(game.get_possible_move())
+            game.move(move[0], move[1])
+    return leaves
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the incremental features")
+    parser.add_argument("--games", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    leaves = check(args.games, args.depth, args.seed)
+    print(f"{leaves} leaves evaluated as from scratch")
+
+
+if __name__ == "__main__":
+    main()
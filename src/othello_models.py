@@ -3,10 +3,11 @@
     Contains the GameBoard, Players, Score, Turn, and OptionDialog
 """
 
-import os.path
 import othello
+import othello_protocol
+import othello_registry
+import othello_search
 import tkinter
-import glob
 import time
 
 # GUI / tkinter object constants
@@ -15,6 +16,8 @@ GAME_COLOR = "#006000"
 FONT = ("Helvetica", 30)
 DIALOG_FONT = ("Helvetica", 20)
 PLAYERS = {othello.BLACK: "Black", othello.WHITE: "White"}
+SCORE_COLOR = "#FFFFFF"
+BEST_SCORE_COLOR = "#FFFF00"
 
 
 class GameBoard:
@@ -35,6 +38,14 @@ class GameBoard:
             height=game_height,
             background=GAME_COLOR,
         )
+        # Persistent disc item of each cell, hidden while the cell is empty; only the items
+        # of the cells changed by a move are updated. The geometry is computed by
+        # redraw_board, which recreates everything (new game or resized canvas).
+        self._discs = {}
+        self._cell_width = 0.0
+        self._cell_height = 0.0
+        # Scores of the legal moves drawn by the analysis
+        self._scores = {}
 
     def new_game_settings(self, game_state) -> None:
         """The game board's new game settings is now changed accordingly to
@@ -46,54 +57,93 @@ class GameBoard:
     def redraw_board(self) -> None:
         """Redraws the board"""
         self._board.delete(tkinter.ALL)
-        self._redraw_lines()
+        width = self.get_board_width()
+        height = self.get_board_height()
+        self._cell_width = width / self._cols
+        self._cell_height = height / self._rows
+        self._redraw_lines(width, height)
         self._redraw_cells()
+        self.show_scores(self._scores)
 
-    def _redraw_lines(self) -> None:
+    def _redraw_lines(self, width: float, height: float) -> None:
         """Redraws the board's lines"""
-        row_multiplier = float(self._board.winfo_height()) / self._rows
-        col_multiplier = float(self._board.winfo_width()) / self._cols
-
         # Draw the horizontal lines first
         for row in range(1, self._rows):
-            self._board.create_line(
-                0, row * row_multiplier, self.get_board_width(), row * row_multiplier
-            )
+            self._board.create_line(0, row * self._cell_height, width, row * self._cell_height)
 
         # Draw the column lines next
         for col in range(1, self._cols):
-            self._board.create_line(
-                col * col_multiplier, 0, col * col_multiplier, self.get_board_height()
-            )
+            self._board.create_line(col * self._cell_width, 0, col * self._cell_width, height)
 
     def _redraw_cells(self) -> None:
-        """Redraws all the occupied cells in the board"""
+        """Creates the disc items of all the cells"""
+        self._discs = {}
         for row in range(self._rows):
             for col in range(self._cols):
-                if self._game_state.get_board()[row][col] != othello.NONE:
-                    self._draw_cell(row, col)
+                self._discs[row, col] = self._board.create_oval(
+                    col * self._cell_width,
+                    row * self._cell_height,
+                    (col + 1) * self._cell_width,
+                    (row + 1) * self._cell_height,
+                )
+                self._draw_cell(row, col)
 
     def _draw_cell(self, row: int, col: int) -> None:
-        """Draws the specified cell"""
-        self._board.create_oval(
-            col * self.get_cell_width(),
-            row * self.get_cell_height(),
-            (col + 1) * self.get_cell_width(),
-            (row + 1) * self.get_cell_height(),
-            fill=PLAYERS[self._game_state.get_board()[row][col]],
-        )
+        """Updates the disc item of the specified cell"""
+        color = self._game_state.get_board()[row][col]
+        if color == othello.NONE:
+            self._board.itemconfigure(self._discs[row, col], state=tkinter.HIDDEN)
+        else:
+            self._board.itemconfigure(
+                self._discs[row, col], fill=PLAYERS[color], state=tkinter.NORMAL
+            )
+
+    def update_cells(self, delta: othello.MoveDelta) -> None:
+        """Updates only the cells changed by a move (the delta returned by move())"""
+        if not self._discs:
+            self.redraw_board()
+            return
+        self._draw_cell(delta.row, delta.col)
+        for row, col in delta.flipped:
+            self._draw_cell(row, col)
+
+    def show_scores(self, scores: dict) -> None:
+        """Draws the scores of the moves ({(row, col): score}) in their cells, the best one
+        highlighted"""
+        self.clear_scores()
+        self._scores = scores
+        if not scores:
+            return
+        best = max(scores.values())
+        for (row, col), score in scores.items():
+            self._board.create_text(
+                (col + 0.5) * self.get_cell_width(),
+                (row + 0.5) * self.get_cell_height(),
+                text=_score_text(score),
+                fill=BEST_SCORE_COLOR if score == best else SCORE_COLOR,
+                tags="scores",
+            )
+
+    def clear_scores(self) -> None:
+        """Removes the scores drawn by show_scores"""
+        self._board.delete("scores")
+        self._scores = {}
 
     def update_game_state(self, game_state: othello.OthelloGame) -> None:
         """Updates our current _game_state to the specified one in the argument"""
         self._game_state = game_state
 
     def get_cell_width(self) -> float:
-        """Returns a game cell's width"""
-        return self.get_board_width() / self.get_columns()
+        """Returns a game cell's width, as of the last redraw (or of the canvas before it)"""
+        if not self._cell_width:
+            return self.get_board_width() / self._cols
+        return self._cell_width
 
     def get_cell_height(self) -> float:
-        """Returns a game cell's height"""
-        return self.get_board_height() / self.get_rows()
+        """Returns a game cell's height, as of the last redraw (or of the canvas before it)"""
+        if not self._cell_height:
+            return self.get_board_height() / self._rows
+        return self._cell_height
 
     def get_board_width(self) -> float:
         """Returns the board canvas's width"""
@@ -116,6 +166,15 @@ class GameBoard:
         return self._board
 
 
+def _score_text(score: float) -> str:
+    """Score of a move for the player to move, as drawn on the board"""
+    if score >= othello_search.WIN_SCORE:
+        return "win"
+    if score <= -othello_search.WIN_SCORE:
+        return "loss"
+    return f"{score:.0f}"
+
+
 class Player:
     def __init__(self, name: str, root_window) -> None:
         self._name = name
@@ -274,6 +333,40 @@ class Turn:
         self._restart_timer()
 
 
+class Thinking:
+    def __init__(self, root_window) -> None:
+        """Initializes the label showing the progress of the AI thinking"""
+        self._thinking_label = tkinter.Label(
+            master=root_window,
+            text="",
+            background=BACKGROUND_COLOR,
+            fg="Black",
+            font=DIALOG_FONT,
+        )
+
+    def get_thinking_label(self) -> tkinter.Label:
+        """Returns the thinking label"""
+        return self._thinking_label
+
+    def start(self) -> None:
+        """Shows that the AI started thinking"""
+        self._thinking_label["text"] = "Thinking..."
+
+    def update_info(self, info) -> None:
+        """Shows the last completed iteration of the search (othello_search.SearchInfo)"""
+        self._thinking_label["text"] = (
+            f"Thinking... depth {info.depth}, {info.nodes} nodes, {info.time:.1f}s"
+        )
+
+    def show_error(self, error: Exception) -> None:
+        """Shows that the AI failed to move"""
+        self._thinking_label["text"] = f"The AI failed: {error}"
+
+    def clear(self) -> None:
+        """Hides the thinking text"""
+        self._thinking_label["text"] = ""
+
+
 # Dialog for when the user wants to change the game's settings
 class OptionDialog:
     def __init__(
@@ -283,10 +376,15 @@ class OptionDialog:
 
         self._row_column_option_list = range(4, 20)
 
-        # searches for modules in the ai folder
-        self._player_option_list = ["Human"] + [
-            os.path.basename(path).split(".")[0] for path in glob.glob("ai/*.py")
-        ]
+        # bots of the ai folder and of the installed plugins (see othello_registry)
+        self._player_option_list = ["Human"] + othello_registry.bot_names()
+        # external engines (see othello_protocol)
+        for name in othello_protocol.configured_engines() + [
+            current_black_name,
+            current_white_name,
+        ]:
+            if name not in self._player_option_list:
+                self._player_option_list.append(name)
 
         # Initialize given game attributes
         self._rows = current_rows
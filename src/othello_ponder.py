@@ -0,0 +1,161 @@
+"""
+Pondering: searching on the opponent's time.
+
+A PonderingBot runs a bot in a background process. After sending its move, the process keeps
+searching the positions the opponent can reach, the reply expected by the search first, and
+keeps the moves it finds; the search context of the bot stays warm meanwhile. When the opponent
+plays one of the pondered replies (a ponder hit), the move is already known; if the position is
+still being pondered, its search simply goes on until it ends. The search limits given to
+next_move() also limit the pondering that follows the move.
+
+Only the bots built on othello_search.SearchCore (bot.search) ponder, the others are just run
+in the background process.
+
+Usage:
+    OthelloBotEvaluator([...]).evaluate(PonderingBot("Marti_Da_Silva_Ruhoff"))
+"""
+
+from __future__ import annotations
+
+import inspect
+import othello
+import othello_registry
+import othello_search
+import othello_workers
+
+
+def position_key(game: othello.OthelloGame) -> tuple:
+    """Key identifying a position and the player to move"""
+    board = "".join("".join(row) for row in game.get_board())
+    return game.get_rows(), board, game.get_turn()
+
+
+class PonderingBot:
+    """
+    Bot running in a background process that ponders while the opponent is thinking, selective
+    is passed to othello_registry.create()
+    """
+
+    def __init__(self, bot_name: str, *args, selective: bool = False):
+        self.bot_name = bot_name
+        self.moves = 0
+        self.ponder_hits = 0
+        # Forked from the warm fork server of the bot workers
+        context = othello_workers.get_context()
+        self._connection, worker_connection = context.Pipe()
+        self._process = context.Process(
+            target=_run_worker, args=(bot_name, args, selective, worker_connection), daemon=True
+        )
+        self._process.start()
+
+    def next_move(
+        self, board: othello.OthelloGame, limits: othello_search.SearchLimits = None
+    ) -> tuple[int, int]:
+        """Returns the next move to play, see the next_move of the bots"""
+        self._connection.send(("go", board, limits))
+        move, ponder_hit = self._connection.recv()
+        self.moves += 1
+        self.ponder_hits += ponder_hit
+        return move
+
+    def close(self) -> None:
+        """Stops the background process"""
+        if self._process.is_alive():
+            self._connection.send(("quit", None, None))
+            self._process.join()
+
+    def __str__(self):
+        return f"{self.bot_name} (pondering)"
+
+
+class _Worker:
+    """Background process of a PonderingBot"""
+
+    def __init__(self, bot_name: str, args: tuple, selective: bool, connection):
+        self.bot = othello_registry.create(bot_name, *args, selective=selective)
+        self.connection = connection
+        self.core = getattr(self.bot, "search", None)
+        if self.core is not None:
+            self.core.should_stop = self._should_stop
+        self.takes_limits = "limits" in inspect.signature(self.bot.next_move).parameters
+        # Message received while pondering, handled once the pondering stops
+        self.pending = None
+        # Key of the position being pondered and moves found by the pondering
+        self.pondering = None
+        self.results = {}
+
+    def run(self) -> None:
+        while True:
+            if self.pending is not None:
+                command, game, limits = self.pending
+                self.pending = None
+            else:
+                command, game, limits = self.connection.recv()
+            if command == "quit":
+                return
+
+            key = position_key(game)
+            ponder_hit = key in self.results
+            move = self.results[key] if ponder_hit else self._next_move(game, limits)
+            self.connection.send((move, ponder_hit))
+            self.results = {}
+            if self.core is not None:
+                self._ponder(game, move, limits)
+
+    def _next_move(
+        self, game: othello.OthelloGame, limits: othello_search.SearchLimits
+    ) -> tuple[int, int]:
+        if limits is not None and self.takes_limits:
+            return self.bot.next_move(game, limits)
+        return self.bot.next_move(game)
+
+    def _ponder(
+        self, game: othello.OthelloGame, move: tuple[int, int], limits: othello_search.SearchLimits
+    ) -> None:
+        """Searches the positions after the opponent's replies until a message arrives"""
+        player = game.get_turn()
+        game = game.copy_game()
+        game.move(move[0], move[1])
+        if game.is_game_over():
+            return
+
+        if game.get_turn() == player:
+            # The opponent has to pass
+            positions = [game]
+        else:
+            replies = self.core.order_moves(
+                game, list(set(game.get_possible_move())), self.core.table_move(game, player)
+            )
+            positions = []
+            for reply in replies:
+                position = game.copy_game()
+                position.move(reply[0], reply[1])
+                if position.get_turn() == player and not position.is_game_over():
+                    positions.append(position)
+
+        for position in positions:
+            if self.pending is not None:
+                return
+            key = position_key(position)
+            self.pondering = key
+            try:
+                self.results[key] = self._next_move(position, limits)
+            except othello_search.SearchAborted:
+                return
+            finally:
+                self.pondering = None
+
+    def _should_stop(self) -> bool:
+        """should_stop hook of the search core: stops the pondering when a message arrives"""
+        if self.pondering is None or self.pending is not None:
+            return False
+        if not self.connection.poll():
+            return False
+        self.pending = self.connection.recv()
+        command, game, _ = self.pending
+        # On a ponder hit, the search goes on and its move is sent when it ends
+        return command != "go" or position_key(game) != self.pondering
+
+
+def _run_worker(bot_name: str, args: tuple, selective: bool, connection) -> None:
+    _Worker(bot_name, args, selective, connection).run()
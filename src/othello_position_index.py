@@ -0,0 +1,271 @@
+"""
+Index of the positions reached in recorded games (see othello_records).
+
+Every position of every game is identified by a canonical Zobrist hash: the smallest hash of
+the position over the symmetries of the board (4 for rectangular boards, 8 for square ones), so
+symmetric positions share their entries. The index is a numpy structured array of ENTRY entries
+sorted by hash, stored in a .npy file and memory-mapped for the lookups (binary search).
+
+Tens of millions of positions do not fit in memory as Python objects, so the index is built by
+an external distribution sort: the entries are first spread over bucket files by the high bits
+of their hash, then each bucket is sorted in memory and appended to the index.
+
+Usage:
+    python othello_position_index.py build games.rec --output games.index.npy
+    python othello_position_index.py query games.index.npy 7 9 B <board>
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import os
+import tempfile
+import numpy as np
+import othello
+import othello_protocol
+import othello_records
+
+ENTRY = np.dtype(
+    [
+        ("hash", "<u8"),
+        ("game", "<u8"),  # offset of the game record in the records file
+        ("ply", "<u2"),
+        ("move", "<u2"),  # cell of the move played, in the canonical orientation
+        ("player", "<u2"),  # id of the player to move in the records file
+        ("outcome", "i1"),  # 1 won, 0 tied, -1 lost, for the player to move
+    ]
+)
+
+# Cell codes of the board strings
+_CODES = np.zeros(256, dtype=np.uint8)
+_CODES[ord(othello.BLACK)] = 1
+_CODES[ord(othello.WHITE)] = 2
+
+# Entries kept in memory before they are distributed to the bucket files (about 28 MB)
+BUFFER_SIZE = 1 << 20
+
+
+def symmetries(rows: int, cols: int) -> np.ndarray:
+    """Cell permutations of the symmetries of the board: result[s, cell] = transformed cell"""
+    cells = np.arange(rows * cols).reshape(rows, cols)
+    transforms = [cells, cells[:, ::-1], cells[::-1, :], cells[::-1, ::-1]]
+    if rows == cols:
+        transforms += [cells.T, cells.T[:, ::-1], cells.T[::-1, :], cells.T[::-1, ::-1]]
+    permutations = np.empty((len(transforms), rows * cols), dtype=np.int64)
+    for index, transform in enumerate(transforms):
+        # The cell transform[r, c] goes to (r, c)
+        permutations[index, transform.ravel()] = cells.ravel()
+    return permutations
+
+
+class Hasher:
+    """Canonical Zobrist hashes of the positions of a board geometry"""
+
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        self.permutations = symmetries(rows, cols)
+        self.inverses = np.argsort(self.permutations, axis=1)
+
+        # The keys only depend on the geometry so the hashes are the same in every run
+        rng = np.random.default_rng([rows, cols])
+        keys = rng.integers(1, 2**63, size=(rows * cols, 3), dtype=np.uint64)
+        keys[:, 0] = 0
+        # tables[s, cell, code] is the key of the transformed cell
+        self.tables = keys[self.permutations]
+        self.white_to_move = rng.integers(1, 2**63, dtype=np.uint64)
+        self._cells = np.arange(rows * cols)
+
+    def canonical(
+        self, boards: np.ndarray, white_to_move: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Canonical hashes of positions given as an array of cell codes (positions x cells) and
+        whether White is to move, with the symmetry giving each of them
+        """
+        hashes = np.bitwise_xor.reduce(self.tables[:, self._cells, boards], axis=2)
+        hashes ^= np.where(white_to_move, self.white_to_move, np.uint64(0))
+        symmetry = np.argmin(hashes, axis=0)
+        return hashes[symmetry, np.arange(len(boards))], symmetry
+
+    def position(self, game: othello.OthelloGame) -> tuple[int, int]:
+        """Canonical hash of a game position and the symmetry giving it"""
+        board = "".join("".join(row) for row in game.get_board()).encode()
+        codes = _CODES[np.frombuffer(board, dtype=np.uint8)][None, :]
+        hashes, symmetry = self.canonical(codes, np.array([game.get_turn() == othello.WHITE]))
+        return int(hashes[0]), int(symmetry[0])
+
+
+@functools.lru_cache(maxsize=None)
+def get_hasher(rows: int, cols: int) -> Hasher:
+    return Hasher(rows, cols)
+
+
+def game_entries(record: othello_records.GameRecord, players: dict[str, int]) -> np.ndarray:
+    """Entries of the positions of a game where a move was played"""
+    hasher = get_hasher(record.rows, record.cols)
+    boards = []
+    white_to_move = []
+    plies = []
+    cells = []
+    movers = []
+    for ply, (game, move) in enumerate(record.positions()):
+        if move is None:
+            continue
+        board = "".join("".join(row) for row in game.get_board()).encode()
+        boards.append(np.frombuffer(board, dtype=np.uint8))
+        white_to_move.append(game.get_turn() == othello.WHITE)
+        plies.append(ply)
+        cells.append(move[0] * record.cols + move[1])
+        movers.append(game.get_turn())
+
+    entries = np.zeros(len(boards), dtype=ENTRY)
+    if not boards:
+        return entries
+    hashes, symmetry = hasher.canonical(_CODES[np.stack(boards)], np.array(white_to_move))
+    winner = record.winner()
+    entries["hash"] = hashes
+    entries["game"] = record.offset
+    entries["ply"] = plies
+    entries["move"] = hasher.permutations[symmetry, cells]
+    entries["player"] = [
+        players[record.black if mover == othello.BLACK else record.white] for mover in movers
+    ]
+    entries["outcome"] = [0 if winner is None else 1 if winner == mover else -1 for mover in movers]
+    return entries
+
+
+def build_index(records_path: str, output: str, bucket_bits: int = 8) -> int:
+    """Indexes every position of a records file into output, returns the number of entries"""
+    buckets = 1 << bucket_bits
+    with othello_records.RecordReader(records_path) as reader, tempfile.TemporaryDirectory(
+        dir=os.path.dirname(os.path.abspath(output))
+    ) as work_dir:
+        names = reader.players()
+        players = {name: index for index, name in enumerate(names)}
+
+        # Distribution pass: the entries go to a bucket file by the high bits of their hash
+        paths = [os.path.join(work_dir, f"{bucket}.bin") for bucket in range(buckets)]
+        bucket_files = [open(path, "wb") for path in paths]
+        # One array of entries per game, split over the buckets when they are flushed
+        games = []
+        buffered = 0
+        total = 0
+        for record in reader:
+            entries = game_entries(record, players)
+            games.append(entries)
+            buffered += len(entries)
+            total += len(entries)
+            if buffered >= BUFFER_SIZE:
+                _flush_buffer(games, bucket_files, bucket_bits)
+                buffered = 0
+        _flush_buffer(games, bucket_files, bucket_bits)
+        for bucket_file in bucket_files:
+            bucket_file.close()
+
+        # Sort pass: the buckets are in hash order, each one is sorted in memory
+        index = np.lib.format.open_memmap(output, mode="w+", dtype=ENTRY, shape=(total,))
+        position = 0
+        for bucket in range(buckets):
+            entries = np.fromfile(paths[bucket], dtype=ENTRY)
+            entries.sort(order=["hash", "game", "ply"])
+            index[position : position + len(entries)] = entries
+            position += len(entries)
+        index.flush()
+        del index
+
+    with open(output + ".json", "w") as metadata:
+        json.dump({"records": os.path.abspath(records_path), "players": names}, metadata)
+    return total
+
+
+def _flush_buffer(games: list[np.ndarray], files: list, bucket_bits: int) -> None:
+    """Appends the entries of the games to the files of their buckets and empties the list"""
+    if not games:
+        return
+    entries = np.concatenate(games)
+    games.clear()
+    bucket_of = entries["hash"] >> np.uint64(64 - bucket_bits)
+    order = np.argsort(bucket_of, kind="stable")
+    entries = entries[order]
+    bounds = np.searchsorted(bucket_of[order], np.arange(len(files) + 1, dtype=np.uint64))
+    for bucket, bucket_file in enumerate(files):
+        if bounds[bucket] < bounds[bucket + 1]:
+            entries[bounds[bucket] : bounds[bucket + 1]].tofile(bucket_file)
+
+
+class PositionIndex:
+    """Memory-mapped index built by build_index()"""
+
+    def __init__(self, path: str):
+        self.entries = np.load(path, mmap_mode="r")
+        with open(path + ".json") as metadata:
+            metadata = json.load(metadata)
+        self.records = metadata["records"]
+        self.players = metadata["players"]
+
+    def lookup(self, game: othello.OthelloGame) -> np.ndarray:
+        """Entries of the position of the game (moves in the canonical orientation)"""
+        position_hash, _ = get_hasher(game.get_rows(), game.get_columns()).position(game)
+        key = np.uint64(position_hash)
+        hashes = self.entries["hash"]
+        start = np.searchsorted(hashes, key, side="left")
+        end = np.searchsorted(hashes, key, side="right")
+        return self.entries[start:end]
+
+    def count(self, game: othello.OthelloGame) -> int:
+        """Number of times the position was reached (and a move played from it)"""
+        return len(self.lookup(game))
+
+    def move_stats(self, game: othello.OthelloGame, by_player: bool = False) -> dict:
+        """
+        Statistics of the moves played from the position of the game:
+        move -> {"games", "wins", "draws", "losses", "win_rate"}, or with by_player
+        (player name, move) -> same, the moves being in the orientation of the game
+        """
+        hasher = get_hasher(game.get_rows(), game.get_columns())
+        _, symmetry = hasher.position(game)
+        entries = self.lookup(game)
+        cells = hasher.inverses[symmetry, entries["move"].astype(np.int64)]
+
+        stats = {}
+        for cell, player, outcome in zip(cells, entries["player"], entries["outcome"]):
+            move = divmod(int(cell), game.get_columns())
+            key = (self.players[player], move) if by_player else move
+            counts = stats.setdefault(key, {"games": 0, "wins": 0, "draws": 0, "losses": 0})
+            counts["games"] += 1
+            counts["wins" if outcome > 0 else "draws" if outcome == 0 else "losses"] += 1
+        for counts in stats.values():
+            counts["win_rate"] = (counts["wins"] + counts["draws"] / 2) / counts["games"]
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the positions of recorded games")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="index a records file")
+    build.add_argument("records")
+    build.add_argument("--output", required=True)
+    query = commands.add_parser("query", help="statistics of the moves from a position")
+    query.add_argument("index")
+    query.add_argument("rows")
+    query.add_argument("cols")
+    query.add_argument("turn")
+    query.add_argument("board", help="the cells row by row, B, W or .")
+    query.add_argument("--by-player", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        total = build_index(args.records, args.output)
+        print(f"{total} positions indexed in {args.output}")
+    else:
+        game = othello_protocol.parse_position([args.rows, args.cols, args.turn, args.board])
+        stats = PositionIndex(args.index).move_stats(game, args.by_player)
+        for key, counts in sorted(stats.items(), key=lambda item: -item[1]["games"]):
+            print(f"{key}: {counts['games']} games, win rate {counts['win_rate']:.2%}")
+
+
+if __name__ == "__main__":
+    main()
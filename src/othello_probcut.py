@@ -0,0 +1,187 @@
+"""
+Calibration of the selective search (ProbCut / Multi-ProbCut) of the search core.
+
+ProbCut predicts the score of a deep search from a shallow one: deep = a * shallow + b, with an
+error of standard deviation sigma. The (a, b, sigma) of each (deep, shallow) depth pair are fitted
+by linear regression over recorded positions, separately for each board geometry and game phase
+since the quality of the prediction changes a lot between the opening and the endgame.
+
+The positions are read from a positions file of othello_tuner (the player column is used as the
+player to move), the parameters are written to weights/<bot>.probcut.json.
+
+Usage:
+    python othello_probcut.py positions.txt --bot Marti_Da_Silva_Ruhoff
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+
+import numpy as np
+import othello
+import othello_registry
+import othello_search
+import othello_tuner
+
+# Number of game phases, chosen by the proportion of occupied cells
+PHASES = 4
+
+# Plies added to the depth of the bots in selective mode
+EXTRA_DEPTH = 2
+
+# (deep depth, shallow depth) pairs calibrated by default, of the same parity since the
+# evaluation of Othello swings with the side to move
+DEFAULT_PAIRS = [(4, 2), (5, 3), (6, 2), (6, 4)]
+
+# Positions needed to trust the regression of a pair
+MIN_SAMPLES = 20
+
+
+def phase_of(rows: int, cols: int, discs: int) -> int:
+    """Game phase of a position with the given number of discs"""
+    return min(PHASES - 1, discs * PHASES // (rows * cols))
+
+
+class ProbCut:
+    """
+    Calibrated ProbCut parameters, read by SearchCore._probcut(). params maps
+    "<rows>x<cols>" -> phase -> deep depth -> list of [shallow depth, a, b, sigma].
+    A node is cut when the prediction is more than threshold sigmas outside the window.
+    """
+
+    def __init__(self, params: dict, threshold: float = 1.5):
+        self.params = params
+        self.threshold = threshold
+
+    def pairs(self, rows: int, cols: int, discs: int, depth: int) -> list:
+        """Returns the [shallow depth, a, b, sigma] to try on a node of the given depth"""
+        phases = self.params.get(f"{rows}x{cols}")
+        if phases is None:
+            return []
+        return phases.get(str(phase_of(rows, cols, discs)), {}).get(str(depth), [])
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as probcut_file:
+            json.dump({"threshold": self.threshold, "params": self.params}, probcut_file, indent=2)
+
+    @classmethod
+    def read(cls, path: str) -> ProbCut:
+        with open(path) as probcut_file:
+            data = json.load(probcut_file)
+        return cls(data["params"], data["threshold"])
+
+
+def probcut_path(bot_name: str) -> str:
+    """Path of the ProbCut parameters of a bot"""
+    return os.path.join(othello_tuner.WEIGHTS_DIR, f"{bot_name}.probcut.json")
+
+
+def load(bot_name: str) -> ProbCut:
+    """Returns the calibrated ProbCut parameters of a bot, None if it was never calibrated"""
+    path = probcut_path(bot_name)
+    if not os.path.exists(path):
+        return None
+    return ProbCut.read(path)
+
+
+def read_positions(path: str, limit: int = None):
+    """Iterates over the games of a positions file, the player column being the player to move"""
+    count = 0
+    with open(path) as positions:
+        for line in positions:
+            if not line.strip() or line.startswith("#"):
+                continue
+            rows, cols, player, board, _ = line.split()
+            rows, cols = int(rows), int(cols)
+            game = othello.OthelloGame(rows, cols, player)
+            game.current_board = [list(board[row * cols : (row + 1) * cols]) for row in range(rows)]
+            game.scores = game.compute_scores()
+            if not game.can_move(player):
+                continue
+            yield game
+            count += 1
+            if limit is not None and count >= limit:
+                return
+
+
+def calibrate(
+    evaluate,
+    positions_path: str,
+    pairs=DEFAULT_PAIRS,
+    threshold: float = 1.5,
+    limit: int = None,
+    incremental=None,
+) -> ProbCut:
+    """
+    Searches every position at each depth of the pairs with a full-width search and fits,
+    per geometry, phase and pair, the regression deep = a * shallow + b and its error sigma.
+    incremental is the incremental evaluator evaluate reads, if any (see othello_incremental).
+    """
+    depths = sorted({depth for pair in pairs for depth in pair})
+    samples = {}
+    for game in read_positions(positions_path, limit):
+        core = othello_search.SearchCore(evaluate, max(depths), incremental=incremental)
+        player = game.get_turn()
+        scores = {}
+        for depth in depths:
+            scores[depth], _ = core.alpha_beta(
+                game, depth, -othello_search.INFINITY, othello_search.INFINITY, player
+            )
+
+        geometry = f"{game.get_rows()}x{game.get_columns()}"
+        phase = phase_of(game.get_rows(), game.get_columns(), sum(game.get_scores()))
+        for deep, shallow in pairs:
+            # Won and lost positions say nothing about the evaluation
+            if max(abs(scores[deep]), abs(scores[shallow])) >= othello_search.WIN_SCORE:
+                continue
+            samples.setdefault((geometry, phase, deep, shallow), []).append(
+                (scores[shallow], scores[deep])
+            )
+
+    params = {}
+    for (geometry, phase, deep, shallow), values in sorted(samples.items()):
+        if len(values) < MIN_SAMPLES:
+            continue
+        shallow_scores, deep_scores = np.array(values, dtype=np.float64).T
+        if np.ptp(shallow_scores) == 0:
+            continue
+        a, b = np.polyfit(shallow_scores, deep_scores, 1)
+        if a <= 0:
+            continue
+        sigma = float(np.std(deep_scores - (a * shallow_scores + b)))
+        params.setdefault(geometry, {}).setdefault(str(phase), {}).setdefault(str(deep), []).append(
+            [shallow, float(a), float(b), sigma]
+        )
+    return ProbCut(params, threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the ProbCut parameters of a bot")
+    parser.add_argument("positions", help="file of positions (see othello_tuner)")
+    parser.add_argument("--bot", default="Marti_Da_Silva_Ruhoff")
+    parser.add_argument("--threshold", type=float, default=1.5)
+    parser.add_argument("--limit", type=int, default=None, help="maximum number of positions")
+    parser.add_argument("--output", default=None, help="default: weights/<bot>.probcut.json")
+    args = parser.parse_args()
+
+    bot = othello_registry.create(args.bot)
+    probcut = calibrate(
+        bot.search.evaluate,
+        args.positions,
+        threshold=args.threshold,
+        limit=args.limit,
+        incremental=bot.search.incremental,
+    )
+
+    path = args.output
+    if path is None:
+        os.makedirs(othello_tuner.WEIGHTS_DIR, exist_ok=True)
+        path = probcut_path(args.bot)
+    probcut.save(path)
+    print(f"ProbCut parameters written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Line-based text protocol between the game and the engines, over stdin/stdout.
+
+Commands sent to an engine:
+    othello                                  -> "id name <name>" lines, then "othellook"
+    isready                                  -> "readyok" once the previous commands are done
+    position <rows> <cols> <turn> <board>    board: the cells row by row, B, W or .
+    go [depth N] [time S] [nodes N] [remaining S] [increment S]
+    stop                                     ends the running search
+    quit
+
+While searching, the engine may send "info depth D score S nodes N time T pv R,C R,C ..."
+lines, and it ends the search with "bestmove R,C" (or "bestmove pass" when it has no legal
+move). A command the engine can not carry out, as a go without a position or with invalid
+arguments, is answered with "error <message>" instead.
+
+ExternalEngine makes an engine running in a subprocess look like a bot of ai/, and
+    python othello_protocol.py <bot name>
+exposes a bot of ai/ over the protocol.
+"""
+
+from __future__ import annotations
+
+import inspect
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import othello
+import othello_registry
+import othello_search
+
+# Prefix of the player names which are external engines, followed by the command to run
+ENGINE_PREFIX = "engine:"
+
+# Commands of external engines offered by the game settings, one per line
+ENGINES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "engines.txt")
+
+# Search limits of the go command and their types
+LIMITS = {"depth": int, "time": float, "nodes": int, "remaining": float, "increment": float}
+
+
+class ProtocolError(Exception):
+    """Raised when an engine does not follow the protocol"""
+    pass
+
+
+def format_move(move: tuple[int, int]) -> str:
+    return "pass" if move is None else f"{move[0]},{move[1]}"
+
+
+def parse_move(text: str) -> tuple[int, int]:
+    if text == "pass":
+        return None
+    try:
+        row, col = text.split(",")
+        return int(row), int(col)
+    except ValueError:
+        raise ProtocolError(f"Invalid move {text}")
+
+
+def format_position(game: othello.OthelloGame) -> str:
+    board = "".join("".join(row) for row in game.get_board())
+    return f"position {game.get_rows()} {game.get_columns()} {game.get_turn()} {board}"
+
+
+def parse_position(arguments: list[str]) -> othello.OthelloGame:
+    rows, cols, turn, board = arguments
+    rows, cols = int(rows), int(cols)
+    if (
+        len(board) != rows * cols
+        or turn not in (othello.BLACK, othello.WHITE)
+        or not set(board) <= {othello.BLACK, othello.WHITE, othello.NONE}
+    ):
+        raise ValueError(f"Invalid position {' '.join(map(str, arguments))}")
+    game = othello.OthelloGame(rows, cols, turn)
+    game.current_board = [list(board[row * cols : (row + 1) * cols]) for row in range(rows)]
+    game.scores = game.compute_scores()
+    return game
+
+
+def format_go(limits: othello_search.SearchLimits = None) -> str:
+    words = ["go"]
+    if limits is not None:
+        for name in LIMITS:
+            value = getattr(limits, name)
+            if value is not None:
+                words += [name, str(value)]
+    return " ".join(words)
+
+
+def parse_go(arguments: list[str]) -> othello_search.SearchLimits:
+    values = {}
+    for name, value in zip(arguments[::2], arguments[1::2]):
+        if name in LIMITS:
+            values[name] = LIMITS[name](value)
+    return othello_search.SearchLimits(**values)
+
+
+def format_info(info: othello_search.SearchInfo) -> str:
+    pv = " ".join(format_move(move) for move in info.pv)
+    return (
+        f"info depth {info.depth} score {info.score} nodes {info.nodes} "
+        f"time {info.time:.3f} pv {pv}"
+    ).rstrip()
+
+
+def parse_info(arguments: list[str]) -> othello_search.SearchInfo:
+    values = {"depth": None, "score": None, "nodes": None, "time": None}
+    pv = []
+    index = 0
+    while index < len(arguments):
+        name = arguments[index]
+        if name == "pv":
+            pv = [parse_move(move) for move in arguments[index + 1 :]]
+            break
+        if name in values and index + 1 < len(arguments):
+            values[name] = float(arguments[index + 1])
+        index += 2
+    depth = None if values["depth"] is None else int(values["depth"])
+    nodes = None if values["nodes"] is None else int(values["nodes"])
+    move = pv[0] if pv else None
+    return othello_search.SearchInfo(depth, values["score"], move, pv, nodes, values["time"])
+
+
+def configured_engines() -> list[str]:
+    """Player names of the engines listed in ENGINES_FILE"""
+    if not os.path.exists(ENGINES_FILE):
+        return []
+    with open(ENGINES_FILE) as engines:
+        return [ENGINE_PREFIX + line.strip() for line in engines if line.strip()]
+
+
+class ExternalEngine:
+    """Engine running in a subprocess, used like any bot of ai/"""
+
+    def __init__(self, command: str):
+        self.command = command
+        self.name = command
+        self.last_info = None
+        self._process = subprocess.Popen(
+            shlex.split(command),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        self._send("othello")
+        for words in self._lines():
+            if words[:2] == ["id", "name"]:
+                self.name = " ".join(words[2:])
+            elif words[0] == "othellook":
+                break
+
+    def _send(self, line: str) -> None:
+        self._process.stdin.write(line + "\n")
+        self._process.stdin.flush()
+
+    def _lines(self):
+        """Iterates over the non-empty lines of the engine, split in words"""
+        for line in self._process.stdout:
+            words = line.split()
+            if words:
+                yield words
+        raise ProtocolError(f"{self.name} exited")
+
+    def next_move(
+        self, board: othello.OthelloGame, limits: othello_search.SearchLimits = None
+    ) -> tuple[int, int]:
+        """Returns the best move of the engine, see the next_move of the bots"""
+        self._send(format_position(board))
+        self._send(format_go(limits))
+        for words in self._lines():
+            if words[0] == "info":
+                self.last_info = parse_info(words[1:])
+            elif words[0] == "bestmove":
+                move = parse_move(words[1]) if len(words) > 1 else None
+                if move is None and board.get_possible_move():
+                    raise ProtocolError(f"{self.name} passed with legal moves")
+                return move
+            elif words[0] == "error":
+                raise ProtocolError(f"{self.name}: {' '.join(words[1:])}")
+
+    def close(self) -> None:
+        """Stops the engine"""
+        if self._process.poll() is None:
+            self._send("quit")
+            self._process.wait()
+
+    def __str__(self):
+        return self.name
+
+
+class EngineServer:
+    """Exposes a bot of ai/ over the protocol"""
+
+    def __init__(self, bot, output=sys.stdout):
+        self.bot = bot
+        self.output = output
+        self.game = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _send(self, line: str) -> None:
+        with self._lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def run(self, lines=sys.stdin) -> None:
+        """Handles the commands until quit or the end of the input"""
+        for line in lines:
+            words = line.split()
+            if not words:
+                continue
+            command, arguments = words[0], words[1:]
+            if command == "othello":
+                self._send(f"id name {str(self.bot).strip()}")
+                self._send("othellook")
+            elif command == "isready":
+                self._wait()
+                self._send("readyok")
+            elif command == "position":
+                self._wait()
+                try:
+                    self.game = parse_position(arguments)
+                except ValueError:
+                    self.game = None
+                    self._send(f"error Invalid position {' '.join(arguments)}")
+            elif command == "go":
+                self._wait()
+                if self.game is None:
+                    self._send("error No position to search")
+                    continue
+                try:
+                    limits = parse_go(arguments)
+                except ValueError:
+                    self._send(f"error Invalid limits {' '.join(arguments)}")
+                    continue
+                core = getattr(self.bot, "search", None)
+                if isinstance(core, othello_search.SearchCore):
+                    core.prepare_search()
+                self._thread = threading.Thread(target=self._go, args=(limits,))
+                self._thread.start()
+            elif command == "stop":
+                core = getattr(self.bot, "search", None)
+                if isinstance(core, othello_search.SearchCore):
+                    core.stop()
+                self._wait()
+            elif command == "quit":
+                break
+        self._wait()
+
+    def _wait(self) -> None:
+        """Waits for the running search to end"""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _go(self, limits: othello_search.SearchLimits) -> None:
+        """Runs in the search thread, always answers with a bestmove or an error line"""
+        try:
+            game = self.game.copy_game()
+            if not game.get_possible_move():
+                self._send("bestmove pass")
+                return
+
+            core = getattr(self.bot, "search", None)
+            if isinstance(core, othello_search.SearchCore):
+                progress = lambda info: self._send(format_info(info))
+                _, move = core.search(game, game.get_turn(), limits, progress)
+            elif "limits" in inspect.signature(self.bot.next_move).parameters:
+                move = self.bot.next_move(game, limits)
+            else:
+                move = self.bot.next_move(game)
+        except Exception as error:
+            self._send(f"error {type(error).__name__}: {error}")
+            return
+        self._send(f"bestmove {format_move(move)}")
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python othello_protocol.py <bot name>", file=sys.stderr)
+        sys.exit(1)
+    bot_name = sys.argv[1]
+    bot = othello_registry.create(bot_name)
+    # Whatever the bot prints must not be mixed with the protocol
+    output = sys.stdout
+    sys.stdout = sys.stderr
+    EngineServer(bot, output).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Compact binary records of played games.
+
+A records file starts with MAGIC, followed by records of two kinds:
+    player record:  PLAYER, id (uint16), name length (uint8), name (utf-8)
+    game record:    GAME, rows, cols, flags (uint8), black id, white id, opening, black discs,
+                    white discs, number of moves (uint16), moves
+Each player is defined once per file, before its first game. A move is the index
+row * cols + col of its cell, on one byte (PASS_BYTE for a pass) or, on boards of more than
+PASS_BYTE cells, on two bytes (PASS_WORD for a pass). Every pass is recorded, including the
+ones OthelloGame.move() plays by itself, so a game replays with OthelloGame.play_trusted()
+without any legality check.
+
+RecordWriter appends games to a file, RecordReader memory-maps it and reads the games lazily.
+An incomplete record at the end of a file, left by an interrupted writer, is ignored by the
+reader and cut off by the next writer before it appends.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import othello
+
+MAGIC = b"OTHR\x01"
+
+# Kinds of records
+PLAYER = 0
+GAME = 1
+
+PASS_BYTE = 0xFF
+PASS_WORD = 0xFFFF
+
+# Opening of the games not played from an opening book
+NO_OPENING = 0xFFFF
+
+# Flags of the game records
+WHITE_STARTS = 1
+BLACK_FORFEIT = 2
+WHITE_FORFEIT = 4
+
+_PLAYER = struct.Struct("<BHB")
+_GAME = struct.Struct("<BBBBHHHHHH")
+
+
+def move_width(rows: int, cols: int) -> int:
+    """Number of bytes of a move on a rows x cols board"""
+    return 1 if rows * cols <= PASS_BYTE else 2
+
+
+def encode_moves(rows: int, cols: int, moves: list[tuple[int, int]]) -> bytes:
+    """Encodes moves, None for a pass"""
+    if move_width(rows, cols) == 1:
+        return bytes(PASS_BYTE if move is None else move[0] * cols + move[1] for move in moves)
+    cells = [PASS_WORD if move is None else move[0] * cols + move[1] for move in moves]
+    return struct.pack(f"<{len(cells)}H", *cells)
+
+
+class GameRecord:
+    """A game read from a records file, its moves are decoded on demand"""
+
+    __slots__ = [
+        "offset",
+        "rows",
+        "cols",
+        "flags",
+        "black",
+        "white",
+        "opening",
+        "scores",
+        "_moves",
+    ]
+
+    def __init__(self, offset, rows, cols, flags, black, white, opening, scores, moves):
+        self.offset = offset
+        self.rows = rows
+        self.cols = cols
+        self.flags = flags
+        self.black = black
+        self.white = white
+        self.opening = opening
+        self.scores = scores
+        self._moves = moves
+
+    def first_player(self) -> str:
+        return othello.WHITE if self.flags & WHITE_STARTS else othello.BLACK
+
+    def winner(self) -> str:
+        """Winner of the game, None for a tie"""
+        if self.flags & BLACK_FORFEIT:
+            return othello.WHITE
+        if self.flags & WHITE_FORFEIT:
+            return othello.BLACK
+        black, white = self.scores
+        if black == white:
+            return None
+        return othello.BLACK if black > white else othello.WHITE
+
+    def cells(self) -> list[int]:
+        """Cell index of each move, PASS_BYTE or PASS_WORD for a pass"""
+        if move_width(self.rows, self.cols) == 1:
+            return list(self._moves)
+        return list(struct.unpack(f"<{len(self._moves) // 2}H", self._moves))
+
+    def moves(self) -> list[tuple[int, int]]:
+        """(row, col) of each move, None for a pass"""
+        pass_cell = PASS_BYTE if move_width(self.rows, self.cols) == 1 else PASS_WORD
+        return [None if cell == pass_cell else divmod(cell, self.cols) for cell in self.cells()]
+
+    def positions(self):
+        """
+        Replays the game, yielding (game, move) before each move. The same game is updated
+        in place, copy it to keep a position.
+        """
+        game = othello.OthelloGame(self.rows, self.cols, self.first_player())
+        for move in self.moves():
+            yield game, move
+            if move is None:
+                game.switch_turn()
+            else:
+                game.play_trusted(move[0], move[1])
+
+    def final_game(self) -> othello.OthelloGame:
+        """The game after its last move"""
+        game = othello.OthelloGame(self.rows, self.cols, self.first_player())
+        for move in self.moves():
+            if move is None:
+                game.switch_turn()
+            else:
+                game.play_trusted(move[0], move[1])
+        return game
+
+
+class RecordWriter:
+    """Appends game records to a file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        # Players already defined in the file
+        self.players = {}
+        size = None
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with RecordReader(path) as reader:
+                self.players = {name: index for index, name in enumerate(reader.players())}
+                size = reader.complete_size()
+        self._file = open(path, "ab")
+        if size is not None:
+            # The new records must follow the last complete one
+            self._file.truncate(size)
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+
+    def _player(self, name: str) -> int:
+        """Id of a player, defined in the file on its first game"""
+        if name not in self.players:
+            self.players[name] = len(self.players)
+            data = name.encode("utf-8")[:255]
+            self._file.write(_PLAYER.pack(PLAYER, self.players[name], len(data)) + data)
+        return self.players[name]
+
+    def write_game(
+        self,
+        rows: int,
+        cols: int,
+        black: str,
+        white: str,
+        moves: list[tuple[int, int]],
+        scores: tuple[int, int],
+        first_player: str = othello.BLACK,
+        forfeit: str = None,
+        opening: int = NO_OPENING,
+    ) -> None:
+        """Appends a game, moves being the (row, col) of the moves played and None for passes"""
+        flags = WHITE_STARTS if first_player == othello.WHITE else 0
+        if forfeit == othello.BLACK:
+            flags |= BLACK_FORFEIT
+        elif forfeit == othello.WHITE:
+            flags |= WHITE_FORFEIT
+        header = _GAME.pack(
+            GAME,
+            rows,
+            cols,
+            flags,
+            self._player(black),
+            self._player(white),
+            opening,
+            scores[0],
+            scores[1],
+            len(moves),
+        )
+        self._file.write(header + encode_moves(rows, cols, moves))
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> RecordWriter:
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+
+class RecordReader:
+    """Reads the game records of a file through a memory map"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.path.getsize(path)
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if self._data[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a game records file")
+        self._names = {}
+
+    def _records(self):
+        """Iterates over (kind, offset, fields, end offset) of every record"""
+        data = self._data
+        offset = len(MAGIC)
+        end = len(data)
+        while offset < end:
+            kind = data[offset]
+            if kind == PLAYER:
+                if offset + _PLAYER.size > end:
+                    return
+                _, index, length = _PLAYER.unpack_from(data, offset)
+                start = offset + _PLAYER.size
+                if start + length > end:
+                    return
+                yield PLAYER, offset, (index, bytes(data[start : start + length])), start + length
+                offset = start + length
+            elif kind == GAME:
+                if offset + _GAME.size > end:
+                    return
+                fields = _GAME.unpack_from(data, offset)
+                rows, cols, moves_count = fields[1], fields[2], fields[9]
+                next_offset = offset + _GAME.size + moves_count * move_width(rows, cols)
+                if next_offset > end:
+                    return
+                yield GAME, offset, fields, next_offset
+                offset = next_offset
+            else:
+                raise ValueError(f"Corrupted record at offset {offset} of {self.path}")
+
+    def players(self) -> list[str]:
+        """Names of the players of the file, by id"""
+        names = {}
+        for kind, _, fields, _ in self._records():
+            if kind == PLAYER:
+                names[fields[0]] = fields[1].decode("utf-8")
+        self._names = names
+        return [names[index] for index in sorted(names)]
+
+    def _game(self, offset: int, fields: tuple) -> GameRecord:
+        _, rows, cols, flags, black, white, opening, black_discs, white_discs, count = fields
+        start = offset + _GAME.size
+        moves = self._data[start : start + count * move_width(rows, cols)]
+        return GameRecord(
+            offset,
+            rows,
+            cols,
+            flags,
+            self._names.get(black),
+            self._names.get(white),
+            opening,
+            (black_discs, white_discs),
+            moves,
+        )
+
+    def __iter__(self):
+        """Iterates over the games of the file, in the order they were written"""
+        for kind, offset, fields, _ in self._records():
+            if kind == PLAYER:
+                self._names[fields[0]] = fields[1].decode("utf-8")
+            else:
+                yield self._game(offset, fields)
+
+    def complete_size(self) -> int:
+        """Size of the file up to the end of its last complete record"""
+        size = len(MAGIC)
+        for _, _, _, size in self._records():
+            pass
+        return size
+
+    def game_at(self, offset: int) -> GameRecord:
+        """Game record starting at the given offset (GameRecord.offset)"""
+        if not self._names:
+            self.players()
+        return self._game(offset, _GAME.unpack_from(self._data, offset))
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self) -> RecordReader:
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
@@ -0,0 +1,220 @@
+"""
+Registry of the bots, discovered without importing them.
+
+A bot is a module of ai/ defining a class of the same name with a next_move method, or an entry
+point of the "othello.bots" group of an installed package ("name = package.module:Class").
+The modules of ai/ are read with ast, their metadata cached in INDEX_FILE and only parsed again
+when they change:
+    description     first line of the class docstring
+    time_control    next_move accepts search limits (depth, time, nodes, clock)
+    search          the bot has a search core (othello_search.SearchCore) in self.search
+    geometries      the (rows, cols) of the boards it can play on, from a GEOMETRIES class
+                    attribute; None for any board
+    selective       the bot can search with ProbCut (a selective argument of its constructor)
+
+The bots are imported on first use only, and get_bot() keeps one instance per bot alive, with
+its caches and search tables, from one game to the next.
+"""
+
+from __future__ import annotations
+
+import ast
+import collections
+import importlib
+import importlib.metadata
+import json
+import os
+import threading
+
+AI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai")
+INDEX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bot_index.json")
+INDEX_VERSION = 2
+
+ENTRY_POINT_GROUP = "othello.bots"
+
+BotInfo = collections.namedtuple(
+    "BotInfo",
+    ["name", "description", "time_control", "search", "geometries", "entry_point", "selective"],
+    defaults=[None, None],
+)
+
+_bots = None
+_classes = {}
+_instances = {}
+_lock = threading.RLock()
+
+
+def _module_metadata(path: str, name: str) -> dict:
+    """Metadata of the bot of an ai/ module, None if the module has no bot"""
+    with open(path, encoding="utf-8") as source:
+        try:
+            tree = ast.parse(source.read(), path)
+        except SyntaxError:
+            return None
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef) and node.name == name:
+            break
+    else:
+        return None
+
+    methods = {item.name: item for item in node.body if isinstance(item, ast.FunctionDef)}
+    if "next_move" not in methods:
+        return None
+    next_move = methods["next_move"]
+    arguments = [argument.arg for argument in next_move.args.args + next_move.args.kwonlyargs]
+
+    search = False
+    selective = False
+    if "__init__" in methods:
+        init = methods["__init__"]
+        selective = "selective" in [
+            argument.arg for argument in init.args.args + init.args.kwonlyargs
+        ]
+        for item in ast.walk(methods["__init__"]):
+            if (
+                isinstance(item, ast.Assign)
+                and any(
+                    isinstance(target, ast.Attribute) and target.attr == "search"
+                    for target in item.targets
+                )
+                and isinstance(item.value, ast.Call)
+                and getattr(item.value.func, "attr", getattr(item.value.func, "id", None))
+                == "SearchCore"
+            ):
+                search = True
+
+    geometries = None
+    for item in node.body:
+        if (
+            isinstance(item, ast.Assign)
+            and any(getattr(target, "id", None) == "GEOMETRIES" for target in item.targets)
+        ):
+            try:
+                geometries = [list(geometry) for geometry in ast.literal_eval(item.value)]
+            except ValueError:
+                pass
+
+    docstring = ast.get_docstring(node) or ""
+    return {
+        "description": docstring.strip().split("\n")[0],
+        "time_control": "limits" in arguments,
+        "search": search,
+        "geometries": geometries,
+        "selective": selective,
+    }
+
+
+def _read_index() -> dict:
+    try:
+        with open(INDEX_FILE) as index_file:
+            index = json.load(index_file)
+    except (OSError, ValueError):
+        return {}
+    return index.get("modules", {}) if index.get("version") == INDEX_VERSION else {}
+
+
+def _write_index(modules: dict) -> None:
+    """Writes the index atomically, a failure (read-only directory) only costs a new parse"""
+    temporary = f"{INDEX_FILE}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "w") as index_file:
+            json.dump({"version": INDEX_VERSION, "modules": modules}, index_file, indent=1)
+        os.replace(temporary, INDEX_FILE)
+    except OSError:
+        pass
+
+
+def discover(refresh: bool = False) -> dict[str, BotInfo]:
+    """All the bots by name, from the index updated with the modules changed since"""
+    global _bots
+    with _lock:
+        if _bots is not None and not refresh:
+            return _bots
+
+        cached = _read_index()
+        modules = {}
+        for file_name in sorted(os.listdir(AI_DIR)):
+            name, extension = os.path.splitext(file_name)
+            if extension != ".py" or name.startswith("_"):
+                continue
+            path = os.path.join(AI_DIR, file_name)
+            stat = os.stat(path)
+            entry = cached.get(name)
+            if entry is None or entry["mtime"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                entry = {
+                    "mtime": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "bot": _module_metadata(path, name),
+                }
+            modules[name] = entry
+        if modules != cached:
+            _write_index(modules)
+
+        bots = {}
+        for name, entry in modules.items():
+            if entry["bot"] is not None:
+                metadata = entry["bot"]
+                geometries = metadata["geometries"]
+                bots[name] = BotInfo(
+                    name,
+                    metadata["description"],
+                    metadata["time_control"],
+                    metadata["search"],
+                    None if geometries is None else [tuple(geometry) for geometry in geometries],
+                    selective=metadata["selective"],
+                )
+
+        # Entry points are listed without being loaded: their capabilities are unknown here
+        for entry_point in importlib.metadata.entry_points(group=ENTRY_POINT_GROUP):
+            if entry_point.name not in bots:
+                bots[entry_point.name] = BotInfo(
+                    entry_point.name, "", None, None, None, entry_point.value
+                )
+        _bots = bots
+        return bots
+
+
+def bot_names() -> list[str]:
+    """Names of all the bots"""
+    return sorted(discover())
+
+
+def supports(name: str, rows: int, cols: int) -> bool:
+    """True if the bot can play on a rows x cols board"""
+    geometries = discover()[name].geometries
+    return geometries is None or (rows, cols) in geometries
+
+
+def bot_class(name: str):
+    """Class of a bot, imported on first use"""
+    with _lock:
+        if name not in _classes:
+            info = discover().get(name)
+            if info is None:
+                raise KeyError(f"Unknown bot {name}")
+            if info.entry_point is not None:
+                entry_point = importlib.metadata.EntryPoint(
+                    name, info.entry_point, ENTRY_POINT_GROUP
+                )
+                _classes[name] = entry_point.load()
+            else:
+                _classes[name] = getattr(importlib.import_module(f"ai.{name}"), name)
+        return _classes[name]
+
+
+def create(name: str, *args, selective: bool = False, **kwargs):
+    """
+    New instance of a bot. With selective, the bots which support it search with ProbCut
+    (see othello_probcut), the others are created as usual.
+    """
+    if selective and discover()[name].selective:
+        kwargs["selective"] = True
+    return bot_class(name)(*args, **kwargs)
+
+
+def get_bot(name: str, selective: bool = False):
+    """Instance of a bot shared from one game to the next, created on first use"""
+    with _lock:
+        if (name, selective) not in _instances:
+            _instances[name, selective] = create(name, selective=selective)
+        return _instances[name, selective]
@@ -0,0 +1,749 @@
+"""
+Alpha-beta search core shared by the bots.
+
+The search is a Principal Variation Search (NegaScout): the first move of each node is searched
+with the full (alpha, beta) window, the others with a null window and are only re-searched
+when they fail high. Successive depths are searched by iterative deepening, each iteration
+using an aspiration window around the score of the previous one. A transposition table and a
+history table order the moves so the first move is usually the best one. Both are kept in a
+SearchContext for the whole game: the next search starts from the depth already reached on its
+root by the previous ones.
+
+With ProbCut parameters (see othello_probcut), the search is selective: before searching a node
+deeply, a shallow search predicts the deep score and the node is cut when the prediction falls
+outside (alpha, beta) with enough confidence.
+
+Scores are negamax scores (from the point of view of the player to move), computed from the
+evaluation of the root player like the original alpha_beta of the bots: a won game is worth
+WIN_SCORE and a lost or tied game -WIN_SCORE for the root player.
+"""
+
+from __future__ import annotations
+
+import collections
+import sys
+import threading
+import time
+import othello
+import othello_bitboard
+import othello_clock
+
+WIN_SCORE = sys.maxsize
+INFINITY = float("inf")
+
+# Width of the windows used to test the moves after the first one. Any score above alpha
+# triggers a re-search, so the width only has to be positive.
+NULL_WINDOW = 1
+
+# Nodes searched between two checks of the limits and of the should_stop hook
+STOP_CHECK_INTERVAL = 256
+
+# Transposition table entries kept between two searches of a game
+MAX_TABLE_SIZE = 500_000
+
+# Limits of a search, None for no limit: the maximum depth, the thinking time in seconds and the
+# number of nodes. remaining and increment are the time left on the clock of the player and its
+# increment per move, the time manager of the core then decides how long to think. Without any
+# limit, the depth is max_depth of the core.
+SearchLimits = collections.namedtuple(
+    "SearchLimits", ["depth", "time", "nodes", "remaining", "increment"], defaults=[None] * 5
+)
+
+# State of a search after a completed iteration. The score is from the point of view of the
+# searching player, time is in seconds since the start of the search.
+SearchInfo = collections.namedtuple("SearchInfo", ["depth", "score", "move", "pv", "nodes", "time"])
+
+# Exact score of a root move found by analyse(), from the point of view of the searching player,
+# with its principal variation (starting with the move)
+MoveScore = collections.namedtuple("MoveScore", ["move", "score", "pv"])
+
+# Bounds stored in the transposition table
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when the should_stop hook asks to stop"""
+    pass
+
+
+class _LimitReached(Exception):
+    """Raised inside the search when a limit is reached or stop() is called"""
+    pass
+
+
+class SearchContext:
+    """
+    Search state kept from one search of a game to the next: the transposition table, the
+    history table, the principal variation and the scores of the root moves. When the new root
+    follows the previous one, most of its tree has already been searched.
+
+    A new game is detected when the board geometry changes or the number of discs goes down,
+    the state is then forgotten.
+
+    With a shared_table (othello_smp.SharedTable), the transposition table is that table, shared
+    with the other processes searching the same game. It is never pruned nor forgotten: its
+    entries are aged by the number of discs of the root instead.
+    """
+
+    def __init__(self, max_table_size: int = MAX_TABLE_SIZE, shared_table=None):
+        self.max_table_size = max_table_size
+        self.shared_table = shared_table
+        self.geometry = None
+        self.discs = 0
+        self.root = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets everything, but the shared table"""
+        self.table = {} if self.shared_table is None else self.shared_table
+        self.history = {}
+        self.pv = []
+        self.root_scores = {}
+
+    def prepare(self, game: othello.OthelloGame, player: str) -> None:
+        """Updates the state before searching the game for player"""
+        geometry = (game.get_rows(), game.get_columns())
+        own, other = game.get_bitboards(game.get_turn())
+        discs = bin(own | other).count("1")
+        if geometry != self.geometry or discs < self.discs:
+            self.reset()
+        self.geometry = geometry
+        self.discs = discs
+
+        root = (own, other, game.get_turn(), player)
+        if root != self.root:
+            self.root_scores = {}
+        self.root = root
+
+        # Older history counts matter less
+        for move in self.history:
+            self.history[move] //= 2
+
+        if self.shared_table is not None:
+            self.shared_table.age = discs
+        elif len(self.table) > self.max_table_size:
+            # Positions with fewer discs than the root can not be reached anymore
+            self.table = {
+                key: entry
+                for key, entry in self.table.items()
+                if bin(key[0] | key[1]).count("1") >= discs
+            }
+            if len(self.table) > self.max_table_size:
+                self.table = {}
+
+
+class SearchCore:
+    """
+    Principal Variation Search with iterative deepening and aspiration windows.
+
+    evaluate(game, player) returns the score of a position from the point of view of player.
+    If an incremental evaluator (see othello_incremental) is given, it is kept up to date
+    along the search path so that evaluate can read its features. probcut holds the calibrated
+    parameters of the selective search (see othello_probcut), None for a full-width search.
+
+    The search stops at the limits given to search(), or when stop() is called from another
+    thread, and returns the result of the last completed iteration. A thread starting a search
+    in another thread calls prepare_search() first, so that a stop() arriving before the search
+    has begun is not lost. should_stop, if set, is
+    called every STOP_CHECK_INTERVAL nodes and aborts the search with SearchAborted when it
+    returns True. The tables are kept in a SearchContext, from one
+    search of a game to the next.
+
+    depth_offset makes search() start its iterative deepening that many depths deeper than
+    usual: the helpers of a parallel search (see othello_smp) are staggered this way.
+
+    cache is an optional persistent cache (othello_cache.PersistentCache) of the evaluations
+    and of the results of search(): a root it holds a result for, as deep as the search, is not
+    searched again, and a shallower result saves the first iterations.
+    """
+
+    def __init__(
+        self,
+        evaluate,
+        max_depth: int,
+        aspiration_window: float = 10,
+        incremental=None,
+        probcut=None,
+    ):
+        self.evaluate = evaluate
+        self.max_depth = max_depth
+        self.aspiration_window = aspiration_window
+        self.incremental = incremental
+        self.probcut = probcut
+        self.context = SearchContext()
+        self.nodes = 0
+        self.should_stop = None
+        self.depth_offset = 0
+        self.cache = None
+        # Set by stop(): one event per search, created by prepare_search() or _begin()
+        self._stop_event = threading.Event()
+        self._prepared = False
+        self._deadline = None
+        self._node_limit = None
+        self.time_manager = othello_clock.TimeManager()
+
+    def search(
+        self,
+        game: othello.OthelloGame,
+        player: str = None,
+        limits: SearchLimits = None,
+        progress=None,
+    ) -> tuple[float, tuple[int, int]]:
+        """
+        Searches the game by iterative deepening within the limits and returns
+        (score for player, best move). progress(info) is called with a SearchInfo after each
+        completed iteration. The game is restored before returning, even when the search is
+        aborted.
+        """
+        if player is None:
+            player = game.get_turn()
+        max_depth, start, timer = self._begin(game, player, limits)
+
+        # The iterations already searched by a previous search of the game are skipped
+        score, best_move, depth = self._previous_result(game, player, max_depth)
+        stored = None if self.cache is None else self.cache.search_result(game, player)
+        if stored is not None and stored[0] > depth:
+            depth, score, best_move = stored
+            if depth >= max_depth:
+                self.context.pv = [best_move]
+                if progress is not None:
+                    progress(SearchInfo(depth, score, best_move, [best_move], 0, 0.0))
+                return score, best_move
+        completed = depth
+        if best_move is None:
+            # Played if the limits stop the first iteration
+            moves = self._legal_moves(game)
+            if moves:
+                best_move = self.order_moves(game, moves, self.table_move(game, player))[0]
+        try:
+            for depth in range(depth + 1 + self.depth_offset, max_depth + 1):
+                score, best_move = self.aspiration_search(game, depth, score, player)
+                completed = depth
+                elapsed = time.monotonic() - start
+                if progress is not None:
+                    pv = self.principal_variation(game, player)
+                    progress(SearchInfo(depth, score, best_move, pv, self.nodes, elapsed))
+                if timer is not None and not timer.next_iteration(best_move, score, elapsed):
+                    break
+        except _LimitReached:
+            pass
+        self.context.pv = self.principal_variation(game, player)
+        if self.cache is not None and completed > 0 and best_move is not None:
+            self.cache.store_search(game, player, completed, score, best_move)
+        return score, best_move
+
+    def _begin(
+        self, game: othello.OthelloGame, player: str, limits: SearchLimits
+    ) -> tuple[int, float, othello_clock.MoveTimer]:
+        """Sets the limits of a search up, returns (maximum depth, start time, move timer)"""
+        if limits is None:
+            limits = SearchLimits()
+        max_depth = limits.depth
+        if max_depth is None:
+            if limits.time is None and limits.nodes is None and limits.remaining is None:
+                max_depth = self.max_depth
+            else:
+                # The other limits stop the search, at the latest at the end of the game
+                empties = game.get_rows() * game.get_columns() - sum(game.get_scores())
+                max_depth = max(1, empties)
+        start = time.monotonic()
+        self._deadline = None if limits.time is None else start + limits.time
+        timer = None
+        if limits.remaining is not None:
+            timer = self.time_manager.move_timer(game, limits.remaining, limits.increment or 0)
+            deadline = start + timer.hard_limit
+            if self._deadline is None or deadline < self._deadline:
+                self._deadline = deadline
+        self._node_limit = limits.nodes
+        if not self._prepared:
+            self._stop_event = threading.Event()
+        self._prepared = False
+        self.context.prepare(game, player)
+        self.nodes = 0
+        return max_depth, start, timer
+
+    def analyse(
+        self,
+        game: othello.OthelloGame,
+        k: int = None,
+        limits: SearchLimits = None,
+        player: str = None,
+        progress=None,
+    ) -> list[MoveScore]:
+        """
+        Multi-PV search: returns the k best root moves (all of them if k is None) with their
+        exact scores for player and their principal variations, best first, by iterative
+        deepening within the limits like search(). progress(depth, results) is called after
+        each completed iteration.
+
+        The moves are searched in the order of the previous iteration. Once k exact scores are
+        known, each other move is only tested with a null window against the k-th best score,
+        and re-searched for its exact score when it beats it: most moves cost a cheap
+        refutation, and all the searches share the transposition table.
+        """
+        if player is None:
+            player = game.get_turn()
+        max_depth, _, _ = self._begin(game, player, limits)
+        sign = 1 if game.get_turn() == player else -1
+        results = []
+        try:
+            for depth in range(1, max_depth + 1):
+                scores = self._multi_pv(game, depth, k, player)
+                results = [
+                    MoveScore(move, sign * value, [move] + self._child_pv(game, move, player))
+                    for move, value in scores
+                ]
+                if progress is not None:
+                    progress(depth, results)
+        except _LimitReached:
+            pass
+        return results
+
+    def _multi_pv(
+        self, game: othello.OthelloGame, depth: int, k: int, player: str
+    ) -> list[tuple[tuple[int, int], float]]:
+        """
+        One iteration of analyse(): the k best (move, negamax score) of the root at the given
+        depth, best first
+        """
+        moves = self._legal_moves(game)
+        if k is None:
+            k = len(moves)
+        if self.incremental is not None:
+            self.incremental.reset(game)
+        self.nodes += 1
+        turn = game.get_turn()
+        root_scores = self.context.root_scores
+        moves = self.order_moves(game, moves, self.table_move(game, player))
+        moves.sort(key=lambda move: -root_scores.get(move, -INFINITY))
+
+        exact = []
+        for move in moves:
+            if len(exact) < k:
+                value = self._exact_move(game, move, turn, depth, player, root_scores.get(move))
+            else:
+                # Null window test against the k-th best score, re-searched only if it beats it
+                alpha = exact[-1][1]
+                value = self._search_move(game, move, turn, depth, alpha, INFINITY, player, False)
+            root_scores[move] = value
+            if len(exact) < k or value > exact[-1][1]:
+                exact.append((move, value))
+                exact.sort(key=lambda result: -result[1])
+                del exact[k:]
+
+        if exact:
+            own, other = game.get_bitboards(turn)
+            move, value = exact[0]
+            self._store((own, other, turn, player), depth, -INFINITY, INFINITY, value, move)
+        return exact
+
+    def _exact_move(
+        self,
+        game: othello.OthelloGame,
+        move: tuple[int, int],
+        turn: str,
+        depth: int,
+        player: str,
+        previous: float,
+    ) -> float:
+        """Exact score of a root move, searched with an aspiration window around previous"""
+        if previous is None or abs(previous) >= WIN_SCORE:
+            return self._search_move(game, move, turn, depth, -INFINITY, INFINITY, player, True)
+        window = self.aspiration_window
+        alpha = previous - window
+        beta = previous + window
+        while True:
+            value = self._search_move(game, move, turn, depth, alpha, beta, player, True)
+            if value <= alpha:
+                window *= 4
+                alpha = previous - window if window < WIN_SCORE else -INFINITY
+            elif value >= beta:
+                window *= 4
+                beta = previous + window if window < WIN_SCORE else INFINITY
+            else:
+                return value
+
+    def _child_pv(
+        self, game: othello.OthelloGame, move: tuple[int, int], player: str
+    ) -> list[tuple[int, int]]:
+        """Principal variation after a root move"""
+        child = game.copy_game()
+        child.move(move[0], move[1])
+        return self.principal_variation(child, player)
+
+    def prepare_search(self) -> None:
+        """Makes stop() apply to the next search, even if it is called before the search begins"""
+        self._stop_event = threading.Event()
+        self._prepared = True
+
+    def stop(self) -> None:
+        """Asks the running search to return as soon as possible, can be called from any thread"""
+        self._stop_event.set()
+
+    def _check_limits(self) -> None:
+        """Raises when the search has to stop"""
+        if self.should_stop is not None and self.should_stop():
+            raise SearchAborted()
+        if (
+            self._stop_event.is_set()
+            or (self._node_limit is not None and self.nodes >= self._node_limit)
+            or (self._deadline is not None and time.monotonic() >= self._deadline)
+        ):
+            raise _LimitReached()
+
+    def _previous_result(
+        self, game: othello.OthelloGame, player: str, max_depth: int
+    ) -> tuple[float, tuple[int, int], int]:
+        """
+        Exact (score for player, best move, depth) of the root found by a previous search,
+        with a depth below max_depth so the search goes on from there; (None, None, 0) if none
+        """
+        own, other = game.get_bitboards(game.get_turn())
+        entry = self.context.table.get((own, other, game.get_turn(), player))
+        if entry is None or entry[1] != EXACT or entry[3] is None:
+            return None, None, 0
+        depth = min(entry[0], max_depth - 1)
+        score = entry[2] if game.get_turn() == player else -entry[2]
+        return score, entry[3], depth
+
+    def aspiration_search(
+        self, game: othello.OthelloGame, depth: int, previous: float, player: str
+    ) -> tuple[float, tuple[int, int]]:
+        """
+        Searches at the given depth with a window centred on the previous iteration's score,
+        widening it each time the score falls outside
+        """
+        if previous is None or abs(previous) >= WIN_SCORE:
+            return self.alpha_beta(game, depth, -INFINITY, INFINITY, player)
+
+        window = self.aspiration_window
+        alpha = previous - window
+        beta = previous + window
+        while True:
+            score, move = self.alpha_beta(game, depth, alpha, beta, player)
+            if score <= alpha:
+                window *= 4
+                alpha = previous - window if window < WIN_SCORE else -INFINITY
+            elif score >= beta:
+                window *= 4
+                beta = previous + window if window < WIN_SCORE else INFINITY
+            else:
+                return score, move
+
+    def alpha_beta(
+        self, game: othello.OthelloGame, depth: int, alpha: float, beta: float, player: str
+    ) -> tuple[float, tuple[int, int]]:
+        """
+        Searches the root at a fixed depth within (alpha, beta), both from the point of view of
+        player, and returns (score for player, best move)
+        """
+        sign = 1 if game.get_turn() == player else -1
+        if self.incremental is not None:
+            self.incremental.reset(game)
+        if sign == 1:
+            value, move = self._root(game, depth, alpha, beta, player)
+            return value, move
+        value, move = self._root(game, depth, -beta, -alpha, player)
+        return -value, move
+
+    def _root(
+        self, game: othello.OthelloGame, depth: int, alpha: float, beta: float, player: str
+    ) -> tuple[float, tuple[int, int]]:
+        """Root node: same as _pvs() but also returns the best move"""
+        moves = self._legal_moves(game)
+        if not moves:
+            return self._pvs(game, depth, alpha, beta, player), None
+
+        # Best moves of the previous iteration first, else the move of a previous search
+        self.nodes += 1
+        turn = game.get_turn()
+        root_scores = self.context.root_scores
+        moves = self.order_moves(game, moves, self.table_move(game, player))
+        moves.sort(key=lambda move: -root_scores.get(move, -INFINITY))
+
+        original_alpha = alpha
+        best_value = -INFINITY
+        best_move = moves[0]
+        for index, move in enumerate(moves):
+            value = self._search_move(game, move, turn, depth, alpha, beta, player, index == 0)
+            root_scores[move] = value
+            if value > best_value:
+                best_value = value
+                best_move = move
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                break
+
+        own, other = game.get_bitboards(turn)
+        self._store((own, other, turn, player), depth, original_alpha, beta, best_value, best_move)
+        return best_value, best_move
+
+    def _search_move(
+        self,
+        game: othello.OthelloGame,
+        move: tuple[int, int],
+        turn: str,
+        depth: int,
+        alpha: float,
+        beta: float,
+        player: str,
+        first: bool,
+    ) -> float:
+        """Plays a move, searches it with PVS windows and takes it back"""
+        delta = game.move(move[0], move[1], return_delta=True)
+        if self.incremental is not None:
+            self.incremental.apply_delta(delta)
+
+        same_side = game.get_turn() == turn
+        try:
+            if first:
+                value = self._child(game, depth - 1, alpha, beta, player, same_side)
+            else:
+                value = self._child(game, depth - 1, alpha, alpha + NULL_WINDOW, player, same_side)
+                if alpha < value < beta:
+                    value = self._child(game, depth - 1, alpha, beta, player, same_side)
+        finally:
+            if self.incremental is not None:
+                self.incremental.revert_delta(delta)
+            game.undo(delta)
+        return value
+
+    def _child(
+        self,
+        game: othello.OthelloGame,
+        depth: int,
+        alpha: float,
+        beta: float,
+        player: str,
+        same_side: bool,
+    ) -> float:
+        """Searches a child node and returns its score from the parent's point of view"""
+        if same_side:
+            # The opponent had to pass, the same player moves again
+            return self._pvs(game, depth, alpha, beta, player)
+        return -self._pvs(game, depth, -beta, -alpha, player)
+
+    def _pvs(
+        self, game: othello.OthelloGame, depth: int, alpha: float, beta: float, player: str
+    ) -> float:
+        """Principal Variation Search of an inner node, fail-soft"""
+        self.nodes += 1
+        if self.nodes % STOP_CHECK_INTERVAL == 0:
+            self._check_limits()
+        turn = game.get_turn()
+        own, other = game.get_bitboards(turn)
+        geometry = othello_bitboard.get_geometry(game.get_rows(), game.get_columns())
+        moves_mask = geometry.legal_moves(own, other)
+
+        if not moves_mask:
+            if not geometry.legal_moves(other, own):
+                return self.terminal_score(game, player)
+            # Only happens when the turn has been switched by hand: pass
+            game.switch_turn()
+            try:
+                return -self._pvs(game, depth, -beta, -alpha, player)
+            finally:
+                game.switch_turn()
+
+        if depth <= 0:
+            if self.cache is None:
+                value = self.evaluate(game, player)
+            else:
+                value = self.cache.evaluate(game, player, self.evaluate)
+            return value if turn == player else -value
+
+        key = (own, other, turn, player)
+        entry = self.context.table.get(key)
+        table_move = None
+        if entry is not None:
+            entry_depth, bound, entry_value, table_move = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return entry_value
+                if bound == LOWER and entry_value >= beta:
+                    return entry_value
+                if bound == UPPER and entry_value <= alpha:
+                    return entry_value
+
+        if self.probcut is not None:
+            discs = bin(own | other).count("1")
+            cut = self._probcut(game, depth, alpha, beta, player, discs)
+            if cut is not None:
+                return cut
+
+        original_alpha = alpha
+        best_value = -INFINITY
+        best_move = None
+        moves = self.order_moves(game, list(geometry.cells(moves_mask)), table_move)
+        for index, move in enumerate(moves):
+            value = self._search_move(game, move, turn, depth, alpha, beta, player, index == 0)
+            if value > best_value:
+                best_value = value
+                best_move = move
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                history = self.context.history
+                history[move] = history.get(move, 0) + depth * depth
+                break
+
+        self._store(key, depth, original_alpha, beta, best_value, best_move)
+        return best_value
+
+    def _store(
+        self,
+        key: tuple,
+        depth: int,
+        alpha: float,
+        beta: float,
+        value: float,
+        move: tuple[int, int],
+    ) -> None:
+        """Stores the result of a node searched within (alpha, beta) in the transposition table"""
+        if value <= alpha:
+            bound = UPPER
+        elif value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.context.table[key] = (depth, bound, value, move)
+
+    def _probcut(
+        self,
+        game: othello.OthelloGame,
+        depth: int,
+        alpha: float,
+        beta: float,
+        player: str,
+        discs: int,
+    ) -> float:
+        """
+        Multi-ProbCut: for each calibrated (shallow depth, a, b, sigma) of the node's depth, the
+        deep score is predicted as a * shallow score + b with a standard error sigma. Returns
+        the bound to cut the node with, or None if no shallow search is conclusive.
+        """
+        threshold = self.probcut.threshold
+        rows, cols = game.get_rows(), game.get_columns()
+        for shallow, a, b, sigma in self.probcut.pairs(rows, cols, discs, depth):
+            # Calibrated on the scores of positions searched for the player to move: at the
+            # nodes of the other player, the scores are those for the root player negated
+            if game.get_turn() != player:
+                b = -b
+            if abs(beta) < WIN_SCORE:
+                bound = (beta + threshold * sigma - b) / a
+                if self._pvs(game, shallow, bound - NULL_WINDOW, bound, player) >= bound:
+                    return beta
+            if abs(alpha) < WIN_SCORE:
+                bound = (alpha - threshold * sigma - b) / a
+                if self._pvs(game, shallow, bound, bound + NULL_WINDOW, player) <= bound:
+                    return alpha
+        return None
+
+    def table_move(self, game: othello.OthelloGame, player: str) -> tuple[int, int]:
+        """
+        Best move of the player to move stored by a search of the root player, None if the
+        position has not been searched
+        """
+        own, other = game.get_bitboards(game.get_turn())
+        entry = self.context.table.get((own, other, game.get_turn(), player))
+        return None if entry is None else entry[3]
+
+    def principal_variation(self, game: othello.OthelloGame, player: str) -> list[tuple[int, int]]:
+        """Sequence of best moves from the game, read from the transposition table"""
+        game = game.copy_game()
+        pv = []
+        move = self.table_move(game, player)
+        while move is not None:
+            pv.append(move)
+            game.move(move[0], move[1])
+            move = self.table_move(game, player)
+        return pv
+
+    def terminal_score(self, game: othello.OthelloGame, player: str) -> float:
+        """Score of a finished game from the point of view of the player to move"""
+        value = WIN_SCORE if game.return_winner() == player else -WIN_SCORE
+        return value if game.get_turn() == player else -value
+
+    def order_moves(
+        self, game: othello.OthelloGame, moves: list[tuple[int, int]], first_move=None
+    ) -> list[tuple[int, int]]:
+        """Orders the moves: transposition table move first, then by history score"""
+        history = self.context.history
+        moves.sort(key=lambda move: -history.get(move, 0))
+        if first_move in moves:
+            moves.remove(first_move)
+            moves.insert(0, first_move)
+        return moves
+
+    def _legal_moves(self, game: othello.OthelloGame) -> list[tuple[int, int]]:
+        """Legal moves of the player to move, without duplicates"""
+        geometry = othello_bitboard.get_geometry(game.get_rows(), game.get_columns())
+        own, other = game.get_bitboards(game.get_turn())
+        return list(geometry.cells(geometry.legal_moves(own, other)))
+
+
+class SearchSession:
+    """
+    Search running in a background thread, which can be polled and stopped at any time:
+
+        session = SearchSession(bot.search)
+        session.start(game, SearchLimits(time=2))
+        ...
+        move = session.stop()
+
+    progress(info), if given, is called from the search thread after each completed iteration.
+    """
+
+    def __init__(self, core: SearchCore, progress=None):
+        self.core = core
+        self.progress = progress
+        self._thread = None
+        self._info = None
+        self._result = None
+
+    def start(
+        self, game: othello.OthelloGame, limits: SearchLimits = None, player: str = None
+    ) -> None:
+        """Starts searching a copy of the game"""
+        if self.is_running():
+            raise RuntimeError("A search is already running")
+        self._info = None
+        self._result = None
+        self.core.prepare_search()
+        self._thread = threading.Thread(
+            target=self._run, args=(game.copy_game(), limits, player), daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, game: othello.OthelloGame, limits: SearchLimits, player: str) -> None:
+        self._result = self.core.search(game, player, limits, self._on_iteration)
+
+    def _on_iteration(self, info: SearchInfo) -> None:
+        self._info = info
+        if self.progress is not None:
+            self.progress(info)
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def poll(self) -> SearchInfo:
+        """State after the last completed iteration, None before the first one"""
+        return self._info
+
+    def wait(self, timeout: float = None) -> bool:
+        """Waits for the search to end by itself, returns False if it is still running"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.is_running()
+
+    def stop(self) -> tuple[int, int]:
+        """Stops the search and returns the best move found"""
+        if self.is_running():
+            self.core.stop()
+            self._thread.join()
+        if self._result is None:
+            return None
+        return self._result[1]
@@ -0,0 +1,462 @@
+"""
+Local analysis server: the bots, kept warm, behind a JSON API over localhost HTTP.
+
+Every tool (the evaluator, notebooks, the GUI) can ask the same server instead of loading the
+bots and warming their caches by itself. The searches run in a pool of persistent worker
+processes per bot (othello_workers.BotWorker). Results are kept in an LRU cache keyed by the
+canonical hash of the position (othello_position_index), so symmetric positions share their
+entries, and identical requests arriving while the first one is computed wait for its result
+instead of searching again. evaluate_batch requests are gathered for a few milliseconds and
+evaluated together with the vectorised features of othello_tuner.
+
+API (POST, JSON bodies; a position is {"rows", "cols", "turn", "board"} with the board as in
+othello_protocol, limits are the fields of othello_search.SearchLimits):
+    /analyse         {"bot", "position", "k", "limits"} -> {"moves": [{"move", "score", "pv"}]}
+    /best_move       {"bot", "position", "limits"}      -> {"move": [row, col] or null}
+    /evaluate_batch  {"bot", "positions", "player"}     -> {"scores": [...]}
+and GET /metrics for the counters of the server (cache hits, coalesced requests, ...).
+
+Usage:
+    python othello_server.py --port 8765 --workers 2
+    AnalysisClient("http://127.0.0.1:8765").best_move(game, "Marti_Da_Silva_Ruhoff")
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+import concurrent.futures
+import http.server
+import json
+import queue
+import threading
+import time
+import urllib.request
+import numpy as np
+import othello
+import othello_position_index
+import othello_protocol
+import othello_registry
+import othello_search
+import othello_tuner
+import othello_workers
+
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+CACHE_SIZE = 100_000
+
+# Time during which evaluate_batch requests are gathered into one evaluation (seconds)
+BATCH_WINDOW = 0.005
+
+
+class RequestError(Exception):
+    """Raised for an invalid request, answered with an HTTP 400"""
+    pass
+
+
+def position_to_json(game: othello.OthelloGame) -> dict:
+    board = "".join("".join(row) for row in game.get_board())
+    return {
+        "rows": game.get_rows(),
+        "cols": game.get_columns(),
+        "turn": game.get_turn(),
+        "board": board,
+    }
+
+
+def position_from_json(position: dict) -> othello.OthelloGame:
+    try:
+        return othello_protocol.parse_position(
+            [position["rows"], position["cols"], position["turn"], position["board"]]
+        )
+    except (KeyError, TypeError, ValueError) as error:
+        raise RequestError(f"Invalid position: {error}")
+
+
+def limits_from_json(limits: dict) -> othello_search.SearchLimits:
+    try:
+        return othello_search.SearchLimits(**(limits or {}))
+    except TypeError as error:
+        raise RequestError(f"Invalid limits: {error}")
+
+
+class _WorkerPool:
+    """Up to size persistent workers of a bot, created on demand"""
+
+    def __init__(self, bot_name: str, size: int):
+        self.bot_name = bot_name
+        self.size = size
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> othello_workers.BotWorker:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._workers) < self.size:
+                worker = othello_workers.BotWorker(self.bot_name, fallback=False)
+                self._workers.append(worker)
+                return worker
+        return self._idle.get()
+
+    def release(self, worker: othello_workers.BotWorker) -> None:
+        self._idle.put(worker)
+
+    def close(self) -> None:
+        for worker in self._workers:
+            worker.close()
+
+
+class _EvaluationBatcher:
+    """Gathers the evaluate_batch requests and evaluates them together, by bot and geometry"""
+
+    def __init__(self, metrics: collections.Counter):
+        self.metrics = metrics
+        self._requests = queue.Queue()
+        self._weights = {}
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def evaluate(self, bot_name: str, boards: np.ndarray) -> np.ndarray:
+        """Scores of boards (N x rows x cols, 1 for the player's discs and -1 for the others')"""
+        if bot_name not in othello_tuner.FEATURE_SETS:
+            raise RequestError(f"{bot_name} has no vectorised evaluation")
+        future = concurrent.futures.Future()
+        self._requests.put((bot_name, boards, future))
+        return future.result()
+
+    def _run(self) -> None:
+        while True:
+            requests = [self._requests.get()]
+            deadline = time.monotonic() + BATCH_WINDOW
+            while True:
+                try:
+                    timeout = max(0, deadline - time.monotonic())
+                    requests.append(self._requests.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            groups = collections.defaultdict(list)
+            for bot_name, boards, future in requests:
+                groups[bot_name, boards.shape[1:]].append((boards, future))
+            for (bot_name, _), group in groups.items():
+                try:
+                    boards = np.concatenate([boards for boards, _ in group])
+                    scores = self._evaluate(bot_name, boards)
+                except Exception as error:
+                    for _, future in group:
+                        future.set_exception(error)
+                    continue
+                self.metrics["evaluation_batches"] += 1
+                self.metrics["evaluated_positions"] += len(scores)
+                start = 0
+                for boards, future in group:
+                    future.set_result(scores[start : start + len(boards)])
+                    start += len(boards)
+
+    def _evaluate(self, bot_name: str, boards: np.ndarray) -> np.ndarray:
+        feature_set = othello_tuner.FEATURE_SETS[bot_name]
+        if bot_name not in self._weights:
+            weights = othello_tuner.load_weights(bot_name, feature_set.defaults)
+            self._weights[bot_name] = feature_set.to_vector(weights)
+        return feature_set.design_matrix(boards) @ self._weights[bot_name]
+
+
+class AnalysisService:
+    """The operations of the server, usable without HTTP"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, cache_size: int = CACHE_SIZE):
+        self.workers = workers
+        self.cache_size = cache_size
+        self.metrics = collections.Counter()
+        self._pools = {}
+        self._cache = collections.OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._batcher = _EvaluationBatcher(self.metrics)
+
+    def analyse(
+        self,
+        bot_name: str,
+        game: othello.OthelloGame,
+        k: int = None,
+        limits: othello_search.SearchLimits = None,
+    ) -> list[othello_search.MoveScore]:
+        """k best moves of the position, see othello_search.SearchCore.analyse"""
+        self._count("analyse")
+        compute = lambda worker: worker.analyse(game, k, limits)
+        transform = lambda results, move: [
+            othello_search.MoveScore(
+                move(result.move), result.score, [move(pv_move) for pv_move in result.pv]
+            )
+            for result in results
+        ]
+        return self._cached(("analyse", bot_name, k, limits), game, compute, transform)
+
+    def best_move(
+        self, bot_name: str, game: othello.OthelloGame, limits: othello_search.SearchLimits = None
+    ) -> tuple[int, int]:
+        """Move the bot plays in the position, None if the player to move has to pass"""
+        self._count("best_move")
+        if not game.get_possible_move():
+            return None
+        compute = lambda worker: worker.next_move(game, limits)
+        transform = lambda result, move: move(result)
+        return self._cached(("best_move", bot_name, limits), game, compute, transform)
+
+    def evaluate_batch(
+        self, bot_name: str, games: list[othello.OthelloGame], player: str = None
+    ) -> list[float]:
+        """Static evaluations of the positions for player (by default the player to move)"""
+        self._count("evaluate_batch")
+        scores = [None] * len(games)
+        by_geometry = collections.defaultdict(list)
+        for index, game in enumerate(games):
+            by_geometry[game.get_rows(), game.get_columns()].append(index)
+        for indexes in by_geometry.values():
+            boards = []
+            for index in indexes:
+                color = player or games[index].get_turn()
+                boards.append(
+                    [
+                        [0 if cell == othello.NONE else 1 if cell == color else -1 for cell in row]
+                        for row in games[index].get_board()
+                    ]
+                )
+            values = self._batcher.evaluate(bot_name, np.array(boards, dtype=np.int8))
+            for index, value in zip(indexes, values):
+                scores[index] = float(value)
+        return scores
+
+    def _cached(self, request: tuple, game: othello.OthelloGame, compute, transform):
+        """
+        Result of compute(worker) for the position, from the cache or from a computation
+        already running for the same canonical position if any. The results are cached in the
+        canonical orientation, transform(result, move) maps their moves with move().
+        """
+        rows, cols = game.get_rows(), game.get_columns()
+        hasher = othello_position_index.get_hasher(rows, cols)
+        position_hash, symmetry = hasher.position(game)
+        key = request + (rows, cols, position_hash)
+
+        owner = False
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.metrics["cache_hits"] += 1
+                future = None
+                result = self._cache[key]
+            elif key in self._in_flight:
+                self.metrics["coalesced"] += 1
+                future = self._in_flight[key]
+            else:
+                self.metrics["cache_misses"] += 1
+                future = self._in_flight[key] = concurrent.futures.Future()
+                owner = True
+
+        if owner:
+            to_canonical = lambda move: _map_move(move, hasher.permutations[symmetry], cols)
+            try:
+                pool = self._pool(request[1])
+                worker = pool.acquire()
+                try:
+                    result = transform(compute(worker), to_canonical)
+                finally:
+                    pool.release(worker)
+            except Exception as error:
+                future.set_exception(error)
+                raise
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+            with self._lock:
+                self._cache[key] = result
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            future.set_result(result)
+        elif future is not None:
+            result = future.result()
+
+        from_canonical = lambda move: _map_move(move, hasher.inverses[symmetry], cols)
+        return transform(result, from_canonical)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.metrics[name] += 1
+
+    def _pool(self, bot_name: str) -> _WorkerPool:
+        if bot_name not in othello_registry.discover():
+            raise RequestError(f"Unknown bot {bot_name}")
+        with self._lock:
+            if bot_name not in self._pools:
+                self._pools[bot_name] = _WorkerPool(bot_name, self.workers)
+            return self._pools[bot_name]
+
+    def get_metrics(self) -> dict:
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics["cache_size"] = len(self._cache)
+        lookups = metrics.get("cache_hits", 0) + metrics.get("cache_misses", 0)
+        metrics["cache_hit_rate"] = metrics.get("cache_hits", 0) / lookups if lookups else 0.0
+        return metrics
+
+    def close(self) -> None:
+        """Stops the workers"""
+        for pool in self._pools.values():
+            pool.close()
+
+
+def _map_move(move: tuple[int, int], permutation: np.ndarray, cols: int) -> tuple[int, int]:
+    if move is None:
+        return None
+    return tuple(divmod(int(permutation[move[0] * cols + move[1]]), cols))
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """HTTP front end of the AnalysisService of the server"""
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._reply(200, self.server.service.get_metrics())
+        else:
+            self._reply(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            bot_name = request.get("bot")
+            if not bot_name:
+                raise RequestError("Missing bot")
+            if self.path == "/analyse":
+                game = position_from_json(request.get("position"))
+                limits = limits_from_json(request.get("limits"))
+                results = service.analyse(bot_name, game, request.get("k"), limits)
+                moves = [
+                    {"move": result.move, "score": result.score, "pv": result.pv}
+                    for result in results
+                ]
+                self._reply(200, {"moves": moves})
+            elif self.path == "/best_move":
+                game = position_from_json(request.get("position"))
+                limits = limits_from_json(request.get("limits"))
+                self._reply(200, {"move": service.best_move(bot_name, game, limits)})
+            elif self.path == "/evaluate_batch":
+                games = [position_from_json(position) for position in request.get("positions", [])]
+                scores = service.evaluate_batch(bot_name, games, request.get("player"))
+                self._reply(200, {"scores": scores})
+            else:
+                self._reply(404, {"error": f"Unknown path {self.path}"})
+        except (RequestError, TypeError, ValueError) as error:
+            self._reply(400, {"error": str(error)})
+        except othello_workers.MoveTimeout as error:
+            self._reply(500, {"error": str(error)})
+
+    def _reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class AnalysisServer(http.server.ThreadingHTTPServer):
+    """HTTP server of an AnalysisService, one thread per request"""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], service: AnalysisService):
+        super().__init__(address, _Handler)
+        self.service = service
+
+
+class AnalysisClient:
+    """Client of an analysis server"""
+
+    def __init__(self, url: str = f"http://127.0.0.1:{DEFAULT_PORT}", timeout: float = None):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _post(self, path: str, request: dict) -> dict:
+        data = json.dumps(request).encode()
+        http_request = urllib.request.Request(
+            self.url + path, data, {"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(http_request, timeout=self.timeout) as response:
+            return json.load(response)
+
+    def analyse(
+        self,
+        game: othello.OthelloGame,
+        bot_name: str,
+        k: int = None,
+        limits: othello_search.SearchLimits = None,
+    ) -> list[othello_search.MoveScore]:
+        request = {"bot": bot_name, "position": position_to_json(game), "k": k}
+        if limits is not None:
+            request["limits"] = limits._asdict()
+        return [
+            othello_search.MoveScore(
+                tuple(result["move"]), result["score"], [tuple(move) for move in result["pv"]]
+            )
+            for result in self._post("/analyse", request)["moves"]
+        ]
+
+    def best_move(
+        self,
+        game: othello.OthelloGame,
+        bot_name: str,
+        limits: othello_search.SearchLimits = None,
+    ) -> tuple[int, int]:
+        request = {"bot": bot_name, "position": position_to_json(game)}
+        if limits is not None:
+            request["limits"] = limits._asdict()
+        move = self._post("/best_move", request)["move"]
+        return None if move is None else tuple(move)
+
+    def evaluate_batch(
+        self, games: list[othello.OthelloGame], bot_name: str, player: str = None
+    ) -> list[float]:
+        request = {
+            "bot": bot_name,
+            "positions": [position_to_json(game) for game in games],
+            "player": player,
+        }
+        return self._post("/evaluate_batch", request)["scores"]
+
+    def metrics(self) -> dict:
+        with urllib.request.urlopen(self.url + "/metrics", timeout=self.timeout) as response:
+            return json.load(response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local analysis server of the bots")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="processes per bot")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE)
+    args = parser.parse_args()
+
+    # The fork server is started now rather than on the first request
+    othello_workers.preload()
+    service = AnalysisService(args.workers, args.cache_size)
+    server = AnalysisServer((args.host, args.port), service)
+    print(f"Analysis server listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""
+Parallel search: Lazy SMP with a transposition table in shared memory.
+
+A ParallelBot runs a bot built on othello_search.SearchCore in several processes which search
+the same root and share their transposition table, a SharedTable. The main process plays the
+move of the bot, the helpers start their iterative deepening one or two depths deeper
+(alternately) and fill the table with deeper results, which cut the search of the main
+process. The helpers are stopped as soon as the main process has its move.
+
+The table is a numpy structured array of ENTRY entries laid out in a
+multiprocessing.shared_memory block, one entry per slot (the slot of a position is given by
+the low bits of its hash). The entries are written without locks: the key of an entry is stored
+XOR the other fields, so an entry torn by two processes writing it at the same time does not
+match any position and is a miss instead of a wrong hit. Within a search, deeper entries are
+kept; the entries of older searches, whose roots had fewer discs, are replaced by any new one.
+
+The block is created, and freed, by the process of the ParallelBot, which restarts the workers
+that crash: their table stays valid. If that process dies without closing the bot, the resource
+tracker of multiprocessing frees the block when it exits.
+
+Usage:
+    OthelloBotEvaluator([...]).evaluate(ParallelBot("Marti_Da_Silva_Ruhoff", processes=4))
+    python othello_smp.py --bot Marti_Da_Silva_Ruhoff --processes 4 --depth 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import inspect
+import os
+import struct
+import time
+from multiprocessing import shared_memory
+import numpy as np
+import othello
+import othello_registry
+import othello_search
+import othello_workers
+
+ENTRY = np.dtype(
+    [
+        ("key", "<u8"),  # hash of the position XOR the other fields
+        ("value", "<f8"),
+        ("depth", "<u2"),  # 0 for an empty entry
+        ("move", "<u2"),  # row << 8 | col, NO_MOVE for none
+        ("age", "<u2"),  # discs of the root of the search which stored the entry
+        ("bound", "u1"),  # othello_search.EXACT, LOWER or UPPER
+    ],
+    align=True,
+)
+
+NO_MOVE = 0xFFFF
+
+# log2 of the number of entries of a table: 24 MB
+DEFAULT_TABLE_BITS = 20
+
+# The entries are read and written with struct on the search path, which is much faster than
+# numpy for a single entry. The value is read as its bits to check the key.
+_ENTRY = struct.Struct("<QQHHHBx")
+_DOUBLE = struct.Struct("<d")
+_WORD = struct.Struct("<Q")
+_MASK = (1 << 64) - 1
+
+assert _ENTRY.size == ENTRY.itemsize
+
+
+def _hash(key: tuple) -> int:
+    """64 bits hash of a key (own, other, turn, player), the same in every process"""
+    own, other, turn, player = key
+    # Unlike the hash of strings, the hash of integers and booleans is not salted per process
+    return hash((own, other, turn == othello.BLACK, player == othello.BLACK)) & _MASK
+
+
+def _fields(depth: int, move: int, age: int, bound: int) -> int:
+    return depth | move << 16 | age << 32 | bound << 48
+
+
+class SharedTable:
+    """
+    Transposition table of 2 ** bits entries in shared memory, with the interface of the
+    tables of othello_search.SearchContext: get(key) and table[key] = (depth, bound, value,
+    move). A new block is created without a name, else the named block is attached. The tables
+    sent to other processes are attached there.
+    """
+
+    def __init__(self, bits: int = DEFAULT_TABLE_BITS, name: str = None):
+        self.bits = bits
+        self.owner = name is None
+        size = 1 << bits
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=size * ENTRY.itemsize)
+        else:
+            self.memory = shared_memory.SharedMemory(name)
+        self.entries = np.ndarray(size, dtype=ENTRY, buffer=self.memory.buf)
+        self._buffer = self.memory.buf
+        self._mask = size - 1
+        # Number of discs of the root being searched, set by SearchContext.prepare()
+        self.age = 0
+
+    def __getstate__(self) -> dict:
+        return {"bits": self.bits, "name": self.memory.name}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["bits"], state["name"])
+
+    def get(self, key: tuple, default=None) -> tuple:
+        """(depth, bound, value, move) stored for the key, default if none or torn"""
+        position = _hash(key)
+        offset = (position & self._mask) * ENTRY.itemsize
+        check, bits, depth, move, age, bound = _ENTRY.unpack_from(self._buffer, offset)
+        if depth == 0 or check ^ bits ^ _fields(depth, move, age, bound) != position:
+            return default
+
+        value = _DOUBLE.unpack(_WORD.pack(bits))[0]
+        if abs(value) >= othello_search.WIN_SCORE:
+            # A float can not hold WIN_SCORE exactly
+            value = othello_search.WIN_SCORE if value > 0 else -othello_search.WIN_SCORE
+        elif value.is_integer():
+            value = int(value)
+        return depth, bound, value, None if move == NO_MOVE else (move >> 8, move & 0xFF)
+
+    def __setitem__(self, key: tuple, entry: tuple) -> None:
+        depth, bound, value, move = entry
+        position = _hash(key)
+        offset = (position & self._mask) * ENTRY.itemsize
+        _, _, stored_depth, _, stored_age, _ = _ENTRY.unpack_from(self._buffer, offset)
+        if stored_age == self.age and stored_depth > depth:
+            return
+
+        move = NO_MOVE if move is None else move[0] << 8 | move[1]
+        bits = _WORD.unpack(_DOUBLE.pack(value))[0]
+        check = position ^ bits ^ _fields(depth, move, self.age, bound)
+        _ENTRY.pack_into(self._buffer, offset, check, bits, depth, move, self.age, bound)
+
+    def usage(self) -> float:
+        """Fraction of the entries in use"""
+        return np.count_nonzero(self.entries["depth"]) / len(self.entries)
+
+    def clear(self) -> None:
+        self.entries[:] = 0
+
+    def close(self) -> None:
+        """Detaches the table, and frees the block if this process created it"""
+        if self.memory is None:
+            return
+        # The views of the block must be released before it is closed
+        self.entries = None
+        self._buffer = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+        self.memory = None
+
+
+class ParallelBot:
+    """
+    Bot searching in processes processes (one per CPU by default) which share a transposition
+    table of 2 ** table_bits entries. Close it to stop the processes and free the table.
+    """
+
+    def __init__(
+        self,
+        bot_name: str,
+        *args,
+        processes: int = None,
+        table_bits: int = DEFAULT_TABLE_BITS,
+    ):
+        self.bot_name = bot_name
+        self.args = args
+        self.processes = processes or os.cpu_count() or 1
+        self.moves = 0
+        self.restarts = 0
+        self.table = SharedTable(table_bits)
+        # Forked from the warm fork server of the bot workers
+        self._context = othello_workers.get_context()
+        self._stop = self._context.Event()
+        self._workers = [None] * self.processes
+        try:
+            for index in range(self.processes):
+                self._start(index)
+        except BaseException:
+            self.close()
+            raise
+
+    def _start(self, index: int) -> None:
+        """Starts a worker process and waits until its bot is created"""
+        connection, worker_connection = self._context.Pipe()
+        process = self._context.Process(
+            target=_run_worker,
+            args=(self.bot_name, self.args, self.table, index, self._stop, worker_connection),
+            daemon=True,
+        )
+        process.start()
+        worker_connection.close()
+        self._workers[index] = (process, connection)
+        answer = connection.recv()
+        if isinstance(answer, Exception):
+            raise answer
+        self.name = answer
+
+    def _restart(self, index: int) -> None:
+        process, connection = self._workers[index]
+        process.kill()
+        process.join()
+        connection.close()
+        self._start(index)
+        self.restarts += 1
+
+    def next_move(
+        self, board: othello.OthelloGame, limits: othello_search.SearchLimits = None
+    ) -> tuple[int, int]:
+        """
+        Returns the next move of the bot, see the next_move of the bots. Raises
+        othello_workers.MoveTimeout if the main process crashes, it is restarted.
+        """
+        for index, (process, _) in enumerate(self._workers):
+            if not process.is_alive():
+                self._restart(index)
+
+        self._stop.clear()
+        for _, connection in self._workers:
+            connection.send((board, limits))
+        try:
+            move = self._workers[0][1].recv()
+        except (EOFError, OSError):
+            move = None
+        self._stop.set()
+        for _, connection in self._workers[1:]:
+            try:
+                connection.recv()
+            except (EOFError, OSError):
+                pass  # restarted before the next move
+
+        if move is None:
+            self._restart(0)
+            raise othello_workers.MoveTimeout(f"{self.name} crashed")
+        self.moves += 1
+        return move
+
+    def close(self) -> None:
+        """Stops the processes and frees the table"""
+        for worker in self._workers:
+            if worker is None:
+                continue
+            process, connection = worker
+            if process.is_alive():
+                try:
+                    connection.send((None, None))
+                except OSError:
+                    process.kill()
+            process.join()
+            connection.close()
+        self._workers = []
+        self.table.close()
+
+    def __str__(self):
+        return f"{self.bot_name} ({self.processes} processes)"
+
+
+def _run_worker(bot_name: str, args: tuple, table: SharedTable, index: int, stop, connection):
+    """Main loop of a worker process, the main one for index 0, else a helper"""
+    bot = othello_registry.create(bot_name, *args)
+    core = getattr(bot, "search", None)
+    if not isinstance(core, othello_search.SearchCore):
+        connection.send(TypeError(f"{bot_name} has no search core to search in parallel"))
+        return
+    core.context = othello_search.SearchContext(shared_table=table)
+    takes_limits = "limits" in inspect.signature(bot.next_move).parameters
+    if index > 0:
+        core.depth_offset = 1 + (index - 1) % 2
+        core.should_stop = stop.is_set
+    connection.send(str(bot))
+
+    try:
+        while True:
+            try:
+                game, limits = connection.recv()
+            except EOFError:  # the process of the ParallelBot died
+                return
+            if game is None:
+                return
+            if index == 0:
+                if takes_limits and limits is not None:
+                    connection.send(bot.next_move(game, limits))
+                else:
+                    connection.send(bot.next_move(game))
+            else:
+                try:
+                    core.search(game.copy_game(), game.get_turn(), limits)
+                except othello_search.SearchAborted:
+                    pass
+                connection.send(None)
+    finally:
+        table.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the parallel search of a bot")
+    parser.add_argument("--bot", default="Marti_Da_Silva_Ruhoff")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--depth", type=int, default=7)
+    parser.add_argument("--moves", type=int, default=10, help="moves of the game to time")
+    args = parser.parse_args()
+
+    limits = othello_search.SearchLimits(depth=args.depth)
+    for processes in sorted({1, args.processes}):
+        bot = ParallelBot(args.bot, processes=processes)
+        game = othello.OthelloGame(8, 8, othello.BLACK)
+        start = time.perf_counter()
+        for _ in range(args.moves):
+            if game.is_game_over():
+                break
+            move = bot.next_move(game, limits)
+            game.move(move[0], move[1])
+        elapsed = time.perf_counter() - start
+        print(f"{bot}: {elapsed:.2f} s, table {bot.table.usage():.1%} full")
+        bot.close()
+
+
+if __name__ == "__main__":
+    main()
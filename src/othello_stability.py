@@ -0,0 +1,171 @@
+"""
+Stable discs, the discs that can never be flipped again.
+
+Edge discs can only be flipped along their edge, so their stability is read from a lookup table
+indexed by the configuration of the edge. The table of each edge length is computed once, by
+trying every move of both players on every empty cell of the edge. Edges longer than
+EXACT_EDGE_LENGTH would need too large tables: on them a disc is stable when the edge is full
+or when it is linked to a corner by discs of its own color.
+
+Interior discs are then found by a fixed-point pass: a disc is stable when, on each of the four
+axes, its line is full or it has a stable disc of its own color next to it.
+"""
+
+from __future__ import annotations
+
+from array import array
+import othello_bitboard
+
+EXACT_EDGE_LENGTH = 10
+
+_EDGE_TABLES = {}
+
+
+def edge_table(length: int) -> tuple[list[int], array]:
+    """
+    Returns the stability table of an edge of the given length, with the ternary weight of each
+    bit mask. The stable cells of an edge (own, other) are table[ternary[own] + 2 * ternary[other]].
+    """
+    if length not in _EDGE_TABLES:
+        _EDGE_TABLES[length] = _build_edge_table(length)
+    return _EDGE_TABLES[length]
+
+
+def _build_edge_table(length: int) -> tuple[list[int], array]:
+    """Computes the stable cells of every configuration of an edge"""
+    ternary = [
+        sum(3**i for i in range(length) if mask >> i & 1) for mask in range(1 << length)
+    ]
+    unknown = 1 << length
+    table = array("I", [unknown]) * (3**length)
+    full = (1 << length) - 1
+
+    def flips(player: int, other: int, cell: int) -> int:
+        """Discs flipped along the edge when player plays on cell"""
+        flipped = 0
+        for step in (1, -1):
+            run = 0
+            index = cell + step
+            while 0 <= index < length and other >> index & 1:
+                run |= 1 << index
+                index += step
+            if run and 0 <= index < length and player >> index & 1:
+                flipped |= run
+        return flipped
+
+    def solve(own: int, other: int) -> int:
+        index = ternary[own] + 2 * ternary[other]
+        if table[index] != unknown:
+            return table[index]
+
+        # A move can be played on any empty cell since it may flip discs outside the edge
+        stable = own | other
+        empties = full & ~stable
+        cell = 0
+        while empties >> cell and stable:
+            if empties >> cell & 1:
+                move = 1 << cell
+                flipped = flips(own, other, cell)
+                stable &= solve(own | move | flipped, other & ~flipped) & ~flipped
+                flipped = flips(other, own, cell)
+                stable &= solve(own & ~flipped, other | move | flipped) & ~flipped
+            cell += 1
+
+        table[index] = stable
+        return stable
+
+    for own in range(1 << length):
+        free = full & ~own
+        other = free
+        while True:
+            solve(own, other)
+            if other == 0:
+                break
+            other = (other - 1) & free
+
+    return ternary, table
+
+
+def _anchored_edge(length: int, own: int, other: int) -> int:
+    """Stable cells of a long edge: all of them if it is full, else the runs from the corners"""
+    occupied = own | other
+    if occupied == (1 << length) - 1:
+        return occupied
+
+    stable = 0
+    for corner, step in ((0, 1), (length - 1, -1)):
+        for color in (own, other):
+            index = corner
+            while 0 <= index < length and color >> index & 1:
+                stable |= 1 << index
+                index += step
+    return stable
+
+
+def edge_stable(length: int, own: int, other: int) -> int:
+    """Returns the mask of the discs of an edge that can never be flipped"""
+    if length > EXACT_EDGE_LENGTH:
+        return _anchored_edge(length, own, other)
+    ternary, table = edge_table(length)
+    return table[ternary[own] + 2 * ternary[other]]
+
+
+def _edge_lines(geometry: othello_bitboard.Geometry, bits: int) -> list[int]:
+    """Returns the bits of the four edges (in the order of geometry.edges) as line masks"""
+    cells = format(bits, "b").zfill(geometry.size)[::-1]
+    cols = geometry.cols
+    lines = [cells[:cols], cells[-cols:], cells[::cols], cells[cols - 1 :: cols]]
+    return [int(line[::-1], 2) for line in lines]
+
+
+def stable_bitboards(own: int, other: int, rows: int, cols: int) -> tuple[int, int]:
+    """Returns the bitboards of the stable discs of (own, other)"""
+    geometry = othello_bitboard.get_geometry(rows, cols)
+
+    # Stable discs of the edges, looked up in the edge tables
+    stable = 0
+    own_edges = _edge_lines(geometry, own)
+    other_edges = _edge_lines(geometry, other)
+    for edge, own_line, other_line in zip(geometry.edges, own_edges, other_edges):
+        line_stable = edge_stable(len(edge), own_line, other_line)
+        index = 0
+        while line_stable:
+            if line_stable & 1:
+                stable |= 1 << edge[index]
+            line_stable >>= 1
+            index += 1
+
+    occupied = own | other
+    full_lines = [
+        (axis, (-axis[0], -axis[1]), geometry.full_lines(occupied, axis))
+        for axis in othello_bitboard.AXES
+    ]
+
+    # Propagate the stability to the interior until nothing changes
+    result = []
+    any_full = any(full for _, _, full in full_lines)
+    for color in (own, other):
+        color_stable = stable & color
+        candidates = color & geometry.interior
+        while candidates and (color_stable or any_full):
+            new_stable = candidates
+            for axis, opposite, full in full_lines:
+                new_stable &= (
+                    full
+                    | geometry.shift(color_stable, axis)
+                    | geometry.shift(color_stable, opposite)
+                )
+            new_stable |= color_stable
+            if new_stable == color_stable:
+                break
+            color_stable = new_stable
+        result.append(color_stable)
+
+    return result[0], result[1]
+
+
+def count_stable(board: list[list[str]], player: str) -> tuple[int, int]:
+    """Returns the number of stable discs of the player and of his opponent on a list board"""
+    own, other = othello_bitboard.from_board(board, player)
+    stable_own, stable_other = stable_bitboards(own, other, len(board), len(board[0]))
+    return bin(stable_own).count("1"), bin(stable_other).count("1")
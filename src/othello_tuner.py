@@ -0,0 +1,404 @@
+"""
+Texel-style tuning of the evaluation weights of the bots.
+
+Reads a file of labelled positions, extracts the evaluation features in bulk with NumPy and fits
+the weights with mini-batch gradient descent (logistic or least-squares regression). The result
+is written to a weights file that the bots load at start-up with load_weights().
+
+Positions file format, one position per line (lines starting with '#' are ignored):
+
+    <rows> <cols> <player> <board> <result>
+
+<board> holds the rows * cols cells read row by row ('.', 'B' or 'W'), <player> is the colour
+the features are computed for and <result> is the final disc difference of the game from the
+point of view of <player>.
+
+Usage:
+    python othello_tuner.py positions.txt --bot Marti_Da_Silva_Ruhoff --loss logistic
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+
+import numpy as np
+import othello
+import othello_stability
+
+WEIGHTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights")
+
+ALL_DIRECTIONS = [
+    (-1, -1),
+    (-1, 0),
+    (-1, 1),
+    (0, -1),
+    (0, 1),
+    (1, -1),
+    (1, 0),
+    (1, 1),
+]
+AXES = [(0, 1), (1, 0), (1, 1), (1, -1)]
+
+CELL_VALUES = {othello.NONE: 0, othello.BLACK: 1, othello.WHITE: -1}
+
+
+def load_weights(bot_name: str, defaults):
+    """
+    Return the tuned weights of a bot, or the given defaults if no weights file exists.
+    Dict defaults are updated key by key so a partial weights file stays usable.
+    """
+    path = os.path.join(WEIGHTS_DIR, f"{bot_name}.json")
+    if not os.path.exists(path):
+        return defaults
+
+    with open(path) as weights_file:
+        weights = json.load(weights_file)["weights"]
+
+    if isinstance(defaults, dict):
+        return {**defaults, **{key: weights[key] for key in defaults if key in weights}}
+    return weights
+
+
+def save_weights(bot_name: str, features: list[str], weights, path: str = None) -> str:
+    """Write the weights file of a bot and return its path"""
+    if path is None:
+        os.makedirs(WEIGHTS_DIR, exist_ok=True)
+        path = os.path.join(WEIGHTS_DIR, f"{bot_name}.json")
+
+    with open(path, "w") as weights_file:
+        json.dump({"bot": bot_name, "features": features, "weights": weights}, weights_file, indent=2)
+    return path
+
+
+# Vectorised board operations. A batch is an int8 array of shape (N, rows, cols) holding
+# 1 for the player's discs, -1 for the opponent's discs and 0 for the empty cells.
+def shift(cells: np.ndarray, direction: tuple[int, int]) -> np.ndarray:
+    """Move every cell of the batch one step in the given direction, filling with False"""
+    d_row, d_col = direction
+    rows, cols = cells.shape[1], cells.shape[2]
+    shifted = np.zeros_like(cells)
+    shifted[
+        :, max(d_row, 0) : rows + min(d_row, 0), max(d_col, 0) : cols + min(d_col, 0)
+    ] = cells[:, max(-d_row, 0) : rows - max(d_row, 0), max(-d_col, 0) : cols - max(d_col, 0)]
+    return shifted
+
+
+def legal_moves(own: np.ndarray, other: np.ndarray, directions=ALL_DIRECTIONS) -> np.ndarray:
+    """
+    Return the mask of the empty cells from which a line in one of the given directions
+    runs over opponent discs and ends on an own disc.
+    """
+    empty = ~(own | other)
+    moves = np.zeros_like(own)
+    for d_row, d_col in directions:
+        backward = (-d_row, -d_col)
+        run = shift(own, backward) & other
+        for _ in range(max(own.shape[1], own.shape[2]) - 3):
+            run |= shift(run, backward) & other
+        moves |= shift(run, backward) & empty
+    return moves
+
+
+def line_has_empty(empty: np.ndarray, axis: tuple[int, int]) -> np.ndarray:
+    """Mask of the cells whose line along the given axis contains an empty cell"""
+    spread = empty.copy()
+    opposite = (-axis[0], -axis[1])
+    for _ in range(max(empty.shape[1], empty.shape[2]) - 1):
+        spread |= shift(spread, axis) | shift(spread, opposite)
+    return spread
+
+
+def edge_stable_discs(own: np.ndarray, other: np.ndarray) -> np.ndarray:
+    """Mask of the edge discs found stable by the edge tables of othello_stability"""
+    stable = np.zeros_like(own)
+    edges = [
+        (slice(None), 0, slice(None)),
+        (slice(None), -1, slice(None)),
+        (slice(None), slice(None), 0),
+        (slice(None), slice(None), -1),
+    ]
+    for edge in edges:
+        length = own[edge].shape[1]
+        # Long edges have no table, the corner runs are found by stable_discs() anyway
+        if length > othello_stability.EXACT_EDGE_LENGTH:
+            continue
+        _, table = othello_stability.edge_table(length)
+        powers = 3 ** np.arange(length)
+        index = own[edge] @ powers + 2 * (other[edge] @ powers)
+        masks = np.frombuffer(table, dtype=np.uint32)[index]
+        stable[edge] |= ((masks[:, None] >> np.arange(length)) & 1).astype(bool)
+    return stable
+
+
+def stable_discs(own: np.ndarray, other: np.ndarray) -> np.ndarray:
+    """
+    Mask of the own discs that can never be flipped, following othello_stability: the edge
+    discs come from the edge tables, then a disc is stable when on each of the four axes its
+    line is full, it touches the border, or it has a stable own disc next to it.
+    """
+    empty = ~(own | other)
+    on_board = np.ones_like(own)
+
+    protected_by_line = []
+    for axis in AXES:
+        opposite = (-axis[0], -axis[1])
+        wall = ~shift(on_board, axis) | ~shift(on_board, opposite)
+        protected_by_line.append((axis, opposite, wall | ~line_has_empty(empty, axis)))
+
+    edges = edge_stable_discs(own, other) & own
+    stable = edges
+    while True:
+        new_stable = own.copy()
+        for axis, opposite, protected in protected_by_line:
+            new_stable &= protected | shift(stable, axis) | shift(stable, opposite)
+        new_stable |= edges
+        if np.array_equal(new_stable, stable):
+            return stable
+        stable = new_stable
+
+
+def count(mask: np.ndarray) -> np.ndarray:
+    """Number of set cells of each board of the batch"""
+    return mask.reshape(mask.shape[0], -1).sum(axis=1)
+
+
+def marti_features(boards: np.ndarray) -> np.ndarray:
+    """Features of Marti_Da_Silva_Ruhoff.evaluate: stable discs and mobility of both players"""
+    own = boards == 1
+    other = boards == -1
+    return np.stack(
+        [
+            count(stable_discs(own, other)),
+            count(stable_discs(other, own)),
+            count(legal_moves(own, other)),
+            count(legal_moves(other, own)),
+        ],
+        axis=1,
+    ).astype(np.float64)
+
+
+def othello_evaluator_features(boards: np.ndarray) -> np.ndarray:
+    """
+    Features of OthelloEvaluator.evaluate: mobility, pattern and material scores. The corner
+    and edge patterns follow the board geometry, they match the evaluator's on 8x8 boards.
+    """
+    own = boards == 1
+    other = boards == -1
+    rows, cols = boards.shape[1], boards.shape[2]
+
+    mobility = count(legal_moves(own, other, [(0, 1), (1, 0), (1, 1), (-1, 1)]))
+
+    corners = np.zeros((rows, cols), dtype=np.int64)
+    for row in (0, rows - 2):
+        for col in (0, cols - 2):
+            corners[row : row + 2, col : col + 2] += 10
+    edges = np.zeros((rows, cols), dtype=np.int64)
+    edges[[0, rows - 1], :] += 5
+    edges[:, [0, cols - 1]] += 5
+    pattern = (own * (corners + edges)).reshape(len(boards), -1).sum(axis=1)
+
+    material = count(own) - count(other)
+    return np.stack([mobility, pattern, material], axis=1).astype(np.float64)
+
+
+class FeatureSet:
+    """
+    Evaluation features of a bot. With phases, the weights are split by game phase: each
+    phase gets its own weight vector, selected by the number of discs on the board.
+    """
+
+    def __init__(self, names: list[str], extract, defaults, phases: dict[str, int] = None):
+        self.names = names
+        self.extract = extract
+        self.defaults = defaults
+        self.phases = phases
+
+    def size(self) -> int:
+        """Number of weights to fit"""
+        return len(self.names) * (len(self.phases) if self.phases else 1)
+
+    def design_matrix(self, boards: np.ndarray) -> np.ndarray:
+        """Feature vectors of a batch, spread over the phase blocks if there are phases"""
+        features = self.extract(boards)
+        if not self.phases:
+            return features
+
+        disc_count = count(boards != 0)
+        phase_index = np.zeros(len(boards), dtype=np.int64)
+        for limit in list(self.phases.values())[:-1]:
+            phase_index += disc_count > limit
+
+        matrix = np.zeros((len(boards), self.size()))
+        for index in range(len(self.phases)):
+            rows = phase_index == index
+            start = index * len(self.names)
+            matrix[rows, start : start + len(self.names)] = features[rows]
+        return matrix
+
+    def to_vector(self, weights) -> np.ndarray:
+        """Flatten weights in the format of the weights file"""
+        if self.phases:
+            return np.concatenate([np.asarray(weights[phase], dtype=np.float64) for phase in self.phases])
+        return np.array([weights[name] for name in self.names], dtype=np.float64)
+
+    def from_vector(self, vector: np.ndarray):
+        """Inverse of to_vector()"""
+        values = [float(value) for value in vector]
+        if self.phases:
+            size = len(self.names)
+            return {phase: values[i * size : (i + 1) * size] for i, phase in enumerate(self.phases)}
+        return dict(zip(self.names, values))
+
+
+FEATURE_SETS = {
+    "Marti_Da_Silva_Ruhoff": FeatureSet(
+        ["own_stable", "other_stable", "own_mobility", "other_mobility"],
+        marti_features,
+        {"own_stable": 5, "other_stable": -10, "own_mobility": 1, "other_mobility": -2},
+    ),
+    "OthelloEvaluator": FeatureSet(
+        ["mobility", "pattern", "material"],
+        othello_evaluator_features,
+        {"early": [0.2, 0.4, 0.4], "mid": [0.3, 0.4, 0.3], "late": [0.1, 0.5, 0.4]},
+        phases={"early": 20, "mid": 40, "late": None},
+    ),
+}
+
+
+def parse_position(line: str) -> tuple[tuple[int, int], list[int], float]:
+    """Parse one line of a positions file into (geometry, cells, result)"""
+    rows, cols, player, board, result = line.split()
+    sign = 1 if player == othello.BLACK else -1
+    cells = [sign * CELL_VALUES[cell] for cell in board]
+    return (int(rows), int(cols)), cells, float(result)
+
+
+def iter_batches(path: str, batch_size: int):
+    """
+    Stream a positions file as batches of (boards, results). Only one pending batch per board
+    geometry is kept in memory, so the file can be far larger than the available memory.
+    """
+    pending = {}
+
+    def flush(geometry):
+        cells, results = pending.pop(geometry)
+        boards = np.array(cells, dtype=np.int8).reshape(len(cells), *geometry)
+        return boards, np.array(results, dtype=np.float64)
+
+    with open(path) as positions:
+        for line in positions:
+            if not line.strip() or line.startswith("#"):
+                continue
+            geometry, cells, result = parse_position(line)
+            batch = pending.setdefault(geometry, ([], []))
+            batch[0].append(cells)
+            batch[1].append(result)
+            if len(batch[0]) >= batch_size:
+                yield flush(geometry)
+
+    for geometry in list(pending):
+        yield flush(geometry)
+
+
+def iter_design(path: str, feature_set: FeatureSet, batch_size: int):
+    """Stream a positions file as batches of (design matrix, results)"""
+    for boards, results in iter_batches(path, batch_size):
+        yield feature_set.design_matrix(boards), results
+
+
+def feature_scale(path: str, feature_set: FeatureSet, batch_size: int) -> np.ndarray:
+    """Mean absolute value of each feature, used to condition the gradient descent"""
+    total = np.zeros(feature_set.size())
+    samples = 0
+    for matrix, _ in iter_design(path, feature_set, batch_size):
+        total += np.abs(matrix).sum(axis=0)
+        samples += len(matrix)
+    scale = total / max(samples, 1)
+    scale[scale == 0] = 1.0
+    return scale
+
+
+def fit(
+    path: str,
+    feature_set: FeatureSet,
+    loss: str = "logistic",
+    epochs: int = 10,
+    batch_size: int = 4096,
+    learning_rate: float = 0.1,
+    k: float = 10.0,
+    initial_weights=None,
+) -> tuple[np.ndarray, list[float]]:
+    """
+    Fit the weights of a feature set with mini-batch gradient descent.
+
+    logistic: the evaluation divided by k is mapped on the game result (win=1, draw=0.5,
+    loss=0) through a sigmoid and the cross-entropy is minimised.
+    least-squares: the evaluation is fitted on the final disc difference.
+
+    Returns the weight vector and the mean loss of each epoch.
+    """
+    scale = feature_scale(path, feature_set, batch_size)
+    initial = feature_set.defaults if initial_weights is None else initial_weights
+    weights = feature_set.to_vector(initial) * scale
+
+    history = []
+    for _ in range(epochs):
+        total_loss = 0.0
+        samples = 0
+        for matrix, results in iter_design(path, feature_set, batch_size):
+            matrix = matrix / scale
+            prediction = matrix @ weights
+            if loss == "logistic":
+                target = (np.sign(results) + 1) / 2
+                probability = 1 / (1 + np.exp(-np.clip(prediction / k, -500, 500)))
+                error = (probability - target) / k
+                eps = 1e-12
+                total_loss -= np.sum(
+                    target * np.log(probability + eps) + (1 - target) * np.log(1 - probability + eps)
+                )
+            elif loss == "least-squares":
+                error = prediction - results
+                total_loss += np.sum(error**2)
+            else:
+                raise ValueError(f"Unknown loss {loss}")
+
+            weights -= learning_rate * (matrix.T @ error) / len(matrix)
+            samples += len(matrix)
+        history.append(total_loss / max(samples, 1))
+
+    return weights / scale, history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the evaluation weights of a bot")
+    parser.add_argument("positions", help="file of labelled positions")
+    parser.add_argument("--bot", default="Marti_Da_Silva_Ruhoff", choices=sorted(FEATURE_SETS))
+    parser.add_argument("--loss", default="logistic", choices=["logistic", "least-squares"])
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--learning-rate", type=float, default=0.1)
+    parser.add_argument("--k", type=float, default=10.0, help="scale of the logistic loss")
+    parser.add_argument("--output", default=None, help="weights file (default: weights/<bot>.json)")
+    args = parser.parse_args()
+
+    feature_set = FEATURE_SETS[args.bot]
+    weights, history = fit(
+        args.positions,
+        feature_set,
+        loss=args.loss,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        learning_rate=args.learning_rate,
+        k=args.k,
+    )
+    for epoch, epoch_loss in enumerate(history):
+        print(f"Epoch {epoch + 1}/{len(history)}: loss {epoch_loss:.6f}")
+
+    path = save_weights(args.bot, feature_set.names, feature_set.from_vector(weights), args.output)
+    print(f"Weights written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""
+Bots running in isolated worker processes.
+
+A BotWorker runs a bot in its own persistent process: a runaway search or a crash can not take
+the caller down, the memory and CPU of the process can be capped with resource limits (on the
+systems which have them) and each move can be given a hard timeout. A bot which times out or
+crashes is killed and restarted for the next move; its move is a fallback move, or a
+MoveTimeout is raised so the caller can count it as a forfeit.
+
+The process stays alive between moves and games, so the imports and the caches of the bot are
+warmed up only once.
+
+The workers (and the pondering processes of othello_ponder) are forked from a fork server which
+has already imported numpy, the engine modules and the bots, and built the tables of the usual
+board geometries (see preload()): they inherit all of it copy-on-write, and start in a few
+milliseconds instead of importing everything again. On the systems without fork server
+(Windows), each worker is spawned and imports everything itself.
+
+Usage:
+    python othello_workers.py --bot Marti_Da_Silva_Ruhoff --workers 8
+measures the start-up time of the workers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import inspect
+import json
+import math
+import multiprocessing
+import multiprocessing.forkserver
+import os
+import threading
+import time
+import othello
+import othello_bitboard
+import othello_cache
+import othello_registry
+import othello_search
+import othello_stability
+
+try:
+    import resource
+except ImportError:  # not available on Windows, the limits are then ignored
+    resource = None
+
+
+# Modules imported by the fork server: this one warms up the bots and tables, and the main
+# script is imported there once instead of in every worker
+PRELOAD_MODULES = [
+    "numpy",
+    "othello",
+    "othello_bitboard",
+    "othello_registry",
+    "othello_search",
+    "othello_stability",
+    "othello_workers",
+    "__main__",
+]
+
+# Geometries whose tables are built by the fork server: the evaluator and the GUI boards
+DEFAULT_GEOMETRIES = [(8, 8), (7, 9)]
+
+# Seconds at least given to a worker to create its bot, when the moves have a timeout
+START_TIMEOUT = 10.0
+
+# Bots and geometries to warm up, passed to the fork server when it starts
+_PRELOAD_ENVIRONMENT = "OTHELLO_WORKERS_PRELOAD"
+
+_context = None
+_context_lock = threading.Lock()
+
+
+class MoveTimeout(Exception):
+    """Raised when a worker did not answer in time, or crashed, and has no fallback"""
+    pass
+
+
+def fallback_move(game: othello.OthelloGame) -> tuple[int, int]:
+    """Move played for a bot which failed to answer: its first legal move"""
+    return sorted(set(game.get_possible_move()))[0]
+
+
+def warm_up(bots: list[str] = None, geometries: list[tuple[int, int]] = DEFAULT_GEOMETRIES) -> None:
+    """
+    Imports the bots (all of them for None) and builds the tables of the geometries, the work
+    that each new worker would otherwise repeat
+    """
+    for name in othello_registry.bot_names() if bots is None else bots:
+        try:
+            othello_registry.bot_class(name)
+        except Exception:  # a broken bot fails in its own worker, not in the fork server
+            pass
+    for rows, cols in geometries:
+        othello_bitboard.get_geometry(rows, cols)
+        for length in {rows, cols}:
+            if length <= othello_stability.EXACT_EDGE_LENGTH:
+                othello_stability.edge_table(length)
+
+
+def preload(bots: list[str] = None, geometries: list[tuple[int, int]] = DEFAULT_GEOMETRIES):
+    """
+    Starts the fork server of the workers, warmed up with warm_up(bots, geometries), and
+    returns the multiprocessing context to start the workers with. The fork server is started
+    once per process: once it runs, the arguments are ignored.
+    """
+    global _context
+    with _context_lock:
+        if _context is not None:
+            return _context
+        if "forkserver" not in multiprocessing.get_all_start_methods():
+            _context = multiprocessing.get_context("spawn")
+            return _context
+
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(PRELOAD_MODULES)
+        os.environ[_PRELOAD_ENVIRONMENT] = json.dumps(
+            {"bots": bots, "geometries": [list(geometry) for geometry in geometries]}
+        )
+        try:
+            multiprocessing.forkserver.ensure_running()
+        finally:
+            del os.environ[_PRELOAD_ENVIRONMENT]
+        # Waits for the warm-up, which the first worker would pay for otherwise
+        process = context.Process(target=int)
+        process.start()
+        process.join()
+        _context = context
+        return context
+
+
+def get_context():
+    """Multiprocessing context of the workers, see preload()"""
+    return _context if _context is not None else preload()
+
+
+class BotWorker:
+    """
+    Bot created by name in a worker process. timeout is the hard limit of a move in seconds,
+    memory_limit the address space of the process in bytes and cpu_limit the CPU seconds of a
+    move (None for no limit). Without fallback, a failed move raises MoveTimeout. With cache,
+    a bot built on othello_search.SearchCore uses its persistent cache (see othello_cache),
+    flushed when the worker is closed. selective is passed to othello_registry.create().
+    """
+
+    def __init__(
+        self,
+        bot_name: str,
+        *args,
+        timeout: float = None,
+        memory_limit: int = None,
+        cpu_limit: float = None,
+        fallback: bool = True,
+        cache: bool = False,
+        selective: bool = False,
+    ):
+        self.bot_name = bot_name
+        self.args = args
+        self.selective = selective
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.cpu_limit = cpu_limit
+        self.fallback = fallback
+        self.cache = cache
+        self.name = bot_name
+        self.timeouts = 0
+        self.crashes = 0
+        self.restarts = 0
+        # Seconds taken by the last start of the worker process, until its bot was created
+        self.startup_time = None
+        self._process = None
+        self._connection = None
+        self._start()
+
+    def _start(self) -> None:
+        """
+        Starts the worker process and waits until the bot is created, raises MoveTimeout if it
+        crashes or does not answer in time
+        """
+        start = time.perf_counter()
+        context = get_context()
+        self._connection, worker_connection = context.Pipe()
+        self._process = context.Process(
+            target=_serve,
+            args=(
+                self.bot_name,
+                self.args,
+                worker_connection,
+                self.memory_limit,
+                self.cpu_limit,
+                self.cache,
+                self.selective,
+            ),
+            daemon=True,
+        )
+        self._process.start()
+        worker_connection.close()
+        timeout = None if self.timeout is None else max(self.timeout, START_TIMEOUT)
+        try:
+            if self._connection.poll(timeout):
+                self.name = self._connection.recv()
+                self.startup_time = time.perf_counter() - start
+                return
+            reason = f"{self.bot_name} did not start within {timeout} s"
+        except (EOFError, OSError):
+            reason = f"{self.bot_name} crashed while starting"
+        self.crashes += 1
+        self._kill()
+        raise MoveTimeout(reason)
+
+    def _kill(self) -> None:
+        self._process.kill()
+        self._process.join()
+        self._connection.close()
+        self._process = None
+
+    def next_move(
+        self, board: othello.OthelloGame, limits=None
+    ) -> tuple[int, int]:
+        """Returns the next move of the bot, see the next_move of the bots"""
+        try:
+            return self._request("go", board, limits)
+        except MoveTimeout:
+            if not self.fallback:
+                raise
+            return fallback_move(board)
+
+    def analyse(self, board: othello.OthelloGame, k: int = None, limits=None) -> list:
+        """
+        Multi-PV analysis of the position by the search core of the bot, see
+        othello_search.SearchCore.analyse. Raises MoveTimeout if the worker fails and TypeError
+        if the bot has no search core.
+        """
+        answer = self._request("analyse", board, (k, limits))
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    def _request(self, command: str, board: othello.OthelloGame, argument):
+        """Sends a command to the worker (restarted if needed) and returns its answer"""
+        if self._process is None or not self._process.is_alive():
+            if self._process is not None:
+                self._kill()
+            self._start()
+            self.restarts += 1
+
+        try:
+            self._connection.send((command, board, argument))
+            if self._connection.poll(self.timeout):
+                return self._connection.recv()
+            self.timeouts += 1
+            reason = f"{self.name} did not answer within {self.timeout} s"
+        except (EOFError, OSError):
+            self.crashes += 1
+            reason = f"{self.name} crashed"
+
+        self._kill()
+        raise MoveTimeout(reason)
+
+    def close(self) -> None:
+        """Stops the worker process"""
+        if self._process is not None and self._process.is_alive():
+            self._connection.send(("quit", None, None))
+            self._process.join()
+        self._process = None
+
+    def __str__(self):
+        return self.name
+
+
+def _serve(
+    bot_name: str,
+    args: tuple,
+    connection,
+    memory_limit: int,
+    cpu_limit: float,
+    cache: bool,
+    selective: bool,
+) -> None:
+    """Main loop of a worker process"""
+    if resource is not None and memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    bot = othello_registry.create(bot_name, *args, selective=selective)
+    takes_limits = "limits" in inspect.signature(bot.next_move).parameters
+    if cache and isinstance(getattr(bot, "search", None), othello_search.SearchCore):
+        cache = othello_cache.attach(bot)
+    connection.send(str(bot))
+
+    while True:
+        command, game, argument = connection.recv()
+        if command == "quit":
+            # The atexit handlers do not run in the worker processes
+            if isinstance(cache, othello_cache.PersistentCache):
+                cache.close()
+            return
+
+        if resource is not None and cpu_limit is not None:
+            # The CPU limit counts the whole life of the process: move it forward on each move
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            soft = math.ceil(usage.ru_utime + usage.ru_stime + cpu_limit)
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+        if command == "analyse":
+            k, limits = argument
+            if isinstance(getattr(bot, "search", None), othello_search.SearchCore):
+                connection.send(bot.search.analyse(game, k, limits))
+            else:
+                connection.send(TypeError(f"{bot_name} has no search core to analyse with"))
+        elif takes_limits and argument is not None:
+            connection.send(bot.next_move(game, argument))
+        else:
+            connection.send(bot.next_move(game))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the start-up time of the workers")
+    parser.add_argument("--bot", default="Marti_Da_Silva_Ruhoff")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--spawn", action="store_true", help="spawn the workers instead of using the fork server"
+    )
+    args = parser.parse_args()
+
+    global _context
+    if args.spawn:
+        _context = multiprocessing.get_context("spawn")
+    else:
+        start = time.perf_counter()
+        preload()
+        print(f"Fork server started in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    workers = [BotWorker(args.bot) for _ in range(args.workers)]
+    times = [worker.startup_time * 1000 for worker in workers]
+    for worker in workers:
+        worker.close()
+    print(
+        f"{args.workers} workers of {args.bot}: {sum(times) / len(times):.1f} ms on average, "
+        f"{min(times):.1f} to {max(times):.1f} ms"
+    )
+
+
+if _PRELOAD_ENVIRONMENT in os.environ:
+    # Imported by the fork server (see preload()): warm up, then keep the objects created so far
+    # out of the garbage collector, whose passes would copy their pages in every worker
+    _preload = json.loads(os.environ[_PRELOAD_ENVIRONMENT])
+    warm_up(_preload["bots"], [tuple(geometry) for geometry in _preload["geometries"]])
+    gc.freeze()
+
+if __name__ == "__main__":
+    main()